@@ -0,0 +1,103 @@
+"""Measure how long it takes to load a criteria file's YAML.
+
+Compares the pure-Python YAML loader, libyaml's C loader (if PyYAML was
+built with it), and unpickling a cached copy of the parsed dictionary (as
+criteria._load_yaml() does after the first load). By default, a large
+criteria file is generated; a path to a real one can be given instead.
+Run it from anywhere with:
+
+    python benchmarks/criteria_load.py [criteria file] [repeats]
+"""
+
+import os
+import sys
+import time
+import pickle
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+import criteria                 # registers the '!object' constructor
+
+NUM_FILES = 40                  # files in the generated criteria
+NUM_TESTS = 15                  # tests for each file
+
+DEFAULT_REPEATS = 3
+
+
+def _generate_criteria():
+    lines = ["name: bench",
+             "group: a",
+             "due:",
+             "  0.0: January 01, 2030 11:59 PM",
+             "  0.1: January 02, 2030 11:59 PM",
+             "files:"]
+
+    for i in range(NUM_FILES):
+        lines += ["  - path: part{}.py".format(i),
+                  "    type: python",
+                  "    point_value: 10",
+                  "    tests:"]
+
+        for j in range(NUM_TESTS):
+            lines += ["      - type: eval",
+                      "        target: func{}".format(j),
+                      "        description: calls func{} on an "
+                      "object".format(j),
+                      "        deduction: 1",
+                      "        args:",
+                      "          - !object:Point "
+                      "{{x: {}, y: {}}}".format(i, j),
+                      "          - [1, 2.5, 'three', true, null]",
+                      "        value: {{'total': {}, 'ok': true}}".format(j)]
+
+    return "\n".join(lines) + "\n"
+
+
+def _best_time(func, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def main(argv):
+    if len(argv) > 0:
+        with open(argv[0]) as f:
+            source = f.read()
+        name = argv[0]
+    else:
+        source = _generate_criteria()
+        name = "generated criteria"
+
+    repeats = int(argv[1]) if len(argv) > 1 else DEFAULT_REPEATS
+
+    print("{} ({:,} bytes), best of {}:".format(name, len(source), repeats))
+
+    loaders = [('pure-Python loader', yaml.Loader)]
+    if yaml.__with_libyaml__:
+        loaders.append(('libyaml loader', yaml.CLoader))
+    else:
+        print("  (PyYAML was built without libyaml; skipping its loader)")
+
+    for desc, loader in loaders:
+        seconds = _best_time(lambda: yaml.load(source, Loader=loader),
+                             repeats)
+        print("  {:<20} {:8.1f} ms".format(desc, seconds * 1000))
+
+    pickled = pickle.dumps(yaml.load(source, Loader=criteria.YAML_LOADER),
+                           pickle.HIGHEST_PROTOCOL)
+    seconds = _best_time(lambda: pickle.loads(pickled), repeats)
+    print("  {:<20} {:8.1f} ms".format('cached (unpickled)', seconds * 1000))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
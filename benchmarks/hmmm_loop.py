@@ -0,0 +1,72 @@
+"""Measure how fast the HMMM simulator executes instructions.
+
+Assembles a program that jumps over a block of padding into a two-instruction
+loop that never halts, runs it until it hits a step limit, and reports the
+number of instructions executed per second. Run it from anywhere with:
+
+    python benchmarks/hmmm_loop.py [steps] [repeats]
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hmc
+from hmc.errors import StepLimitError
+
+PADDING = 100                   # instructions skipped over by the first jump
+
+# a typical program's size, ending in a loop that never halts
+LOOP_PROGRAM = "0 jumpn {}\n".format(PADDING + 1) + \
+               "".join("{} nop\n".format(i + 1) for i in range(PADDING)) + \
+               "{} setn r1 1\n".format(PADDING + 1) + \
+               "{} add r2 r1 r0\n".format(PADDING + 2) + \
+               "{} jumpn {}\n".format(PADDING + 3, PADDING + 2)
+
+DEFAULT_STEPS = 1000000
+DEFAULT_REPEATS = 3
+
+
+def _time_run(binary_path, steps):
+    start = time.perf_counter()
+
+    try:
+        hmc.run(binary_path, debug=False, max_steps=steps)
+    except StepLimitError:
+        pass
+    else:
+        raise RuntimeError("loop program halted before the step limit")
+
+    return time.perf_counter() - start
+
+
+def main(argv):
+    steps = int(argv[0]) if len(argv) > 0 else DEFAULT_STEPS
+    repeats = int(argv[1]) if len(argv) > 1 else DEFAULT_REPEATS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, 'loop.hmmm')
+        binary_path = os.path.join(tmp, 'loop.b')
+
+        with open(source_path, 'w') as f:
+            f.write(LOOP_PROGRAM)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            if not hmc.assemble(source_path, binary_path):
+                print("failed to assemble the loop program", file=sys.stderr)
+                return 1
+
+        best = min(_time_run(binary_path, steps) for _ in range(repeats))
+
+    print("{:,} instructions in {:.3f} s (best of {}): "
+          "{:,.0f} instructions/s".format(steps, best, repeats, steps / best))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
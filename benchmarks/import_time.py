@@ -0,0 +1,92 @@
+"""Check how long it takes to import socrates's modules.
+
+Runs a fresh interpreter with 'python -X importtime', reports the total
+time to import the given modules (by default, the 'criteria' module, which
+every grading run imports) and the slowest imports among their
+dependencies, and exits with a nonzero status if the total is over the
+budget. Run it from anywhere with:
+
+    python benchmarks/import_time.py [--budget MS] [module ...]
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ['criteria']
+DEFAULT_BUDGET = 150            # milliseconds
+NUM_SLOWEST = 10                # imports listed in the report
+
+# modules that must not be imported just by importing the defaults, since
+# only some assignments (or only colored output) need them
+LAZY_MODULES = ['blessed', 'logisim', 'hmc', 'filetypes.pythonfile',
+                'filetypes.picobotfile', 'filetypes.logisimfile',
+                'filetypes.hmmmfile', 'filetypes.jflapfile']
+
+
+def _import_times(modules):
+    """Import the modules in a new interpreter and return a list of
+    (module name, self time, cumulative time) tuples, in microseconds.
+    """
+    code = "; ".join("import " + m for m in modules)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=ROOT, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+
+    if proc.returncode != 0:
+        raise RuntimeError("importing failed:\n" + proc.stderr)
+
+    times = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '[us]' in line:
+            continue
+
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    return times
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Check import times")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help="maximum total import time, in milliseconds "
+                             "(default: {})".format(DEFAULT_BUDGET))
+    args = parser.parse_args(argv)
+
+    times = _import_times(args.modules)
+
+    # top-level imports are not indented
+    total = sum(cumulative for name, _, cumulative in times
+                if name in args.modules) / 1000
+
+    print("importing {} took {:.1f} ms (budget: {:.0f} ms)"
+          .format(", ".join(args.modules), total, args.budget))
+
+    print("slowest imports (self time):")
+    for name, self_us, _ in sorted(times, key=lambda t: -t[1])[:NUM_SLOWEST]:
+        print("  {:8.1f} ms  {}".format(self_us / 1000, name))
+
+    imported = set(name for name, _, _ in times)
+    eager = [m for m in LAZY_MODULES
+             if m in imported and m not in args.modules]
+
+    status = 0
+    if eager:
+        print("imported eagerly, but should only be imported when needed: " +
+              ", ".join(eager))
+        status = 1
+
+    if total > args.budget:
+        print("over budget by {:.1f} ms".format(total - args.budget))
+        status = 1
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
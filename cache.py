@@ -0,0 +1,153 @@
+"""An on-disk cache for results that are expensive to compute.
+
+Entries are stored as pickle files in config.cache_dir, grouped into
+namespaces (one subdirectory each). A key is a hash computed from
+everything the cached value depends on, such as the contents of a
+submission file and the version of the code that processed it, so stale
+entries are never found and nothing needs to be invalidated. Any entry
+can be deleted at any time; a missing or unreadable entry is a cache miss.
+"""
+
+import os
+import pickle
+import hashlib
+
+import config
+
+
+def make_key(*parts):
+    """Return a hexadecimal key computed from the given parts, each of
+    which may be a str or bytes.
+    """
+    h = hashlib.sha256()
+
+    for part in parts:
+        if type(part) is str:
+            part = part.encode('utf-8')
+
+        # include the length so that ('ab', 'c') and ('a', 'bc') differ
+        h.update(str(len(part)).encode('ascii') + b':')
+        h.update(part)
+
+    return h.hexdigest()
+
+
+class CacheKeyError(Exception):
+    """Raised when a key cannot be computed for something, which should
+    then not be cached.
+    """
+    pass
+
+
+def canonical(value):
+    """Return a string representing a value loaded from a criteria file,
+    which is the same for equal values (e.g., dicts whose keys are in a
+    different order, or sets), so that it can be used as part of a key.
+    Objects (e.g., from '!object' tags) are represented by their type and
+    their attributes. CacheKeyError is raised for a value that has no such
+    representation (e.g., one whose repr() includes its memory address).
+    """
+    import json
+
+    try:
+        return json.dumps(_canonical_form(value))
+    except RecursionError:
+        raise CacheKeyError("value is nested too deeply (or contains "
+                            "itself)")
+
+
+def _canonical_form(value):
+    """Return a form of the value that JSON can represent and that is the
+    same for equal values. Each container is tagged with its type, so
+    that, e.g., a list and a set with the same items differ.
+    """
+    import json
+    import datetime
+
+    if value is None or type(value) in [bool, int, float, str]:
+        return value
+
+    if type(value) in [list, tuple]:
+        return ['list', [_canonical_form(v) for v in value]]
+
+    if type(value) is dict:
+        items = [[_canonical_form(k), _canonical_form(v)]
+                 for k, v in value.items()]
+        return ['dict', sorted(items, key=json.dumps)]
+
+    if type(value) in [set, frozenset]:
+        return ['set', sorted((_canonical_form(v) for v in value),
+                              key=json.dumps)]
+
+    if type(value) is bytes:
+        return ['bytes', value.hex()]
+
+    if type(value) in [datetime.date, datetime.datetime]:
+        return ['date', value.isoformat()]
+
+    if hasattr(value, '__dict__') and not callable(value):
+        cls = type(value)
+        return ['object', cls.__module__ + '.' + cls.__qualname__,
+                _canonical_form(vars(value))]
+
+    raise CacheKeyError("cannot compute a key for a value of type "
+                        "'{}'".format(type(value).__name__))
+
+
+def file_hash(path):
+    """Return the SHA-256 hash of the contents of the file at 'path'."""
+    h = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+def load(namespace, key):
+    """Return the value stored under 'key' in the namespace, or None if
+    there is no such entry or it cannot be read.
+    """
+    try:
+        with open(_entry_path(namespace, key), 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def store(namespace, key, value):
+    """Store a picklable value under 'key' in the namespace. Failing to
+    write to the cache, or to pickle the value, is not an error; a warning
+    is printed instead, and the value is not cached.
+    """
+    import tempfile
+    import util
+
+    path = _entry_path(namespace, key)
+    directory = os.path.dirname(path)
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+
+        # write to a temporary file first, so that another process never
+        # reads a partially written entry
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except:
+            os.remove(temp_path)
+            raise
+
+    except OSError as err:
+        util.warning("could not write to cache: " + str(err))
+
+    except (pickle.PicklingError, RecursionError, TypeError,
+            AttributeError) as err:
+        util.warning("could not cache value: " + str(err))
+
+
+def _entry_path(namespace, key):
+    return config.cache_dir + os.sep + namespace + os.sep + key + '.pickle'
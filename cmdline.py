@@ -9,7 +9,8 @@ import util
 def get_args():
     top_opts = {'description': "Grade student work from the command line",
                 'epilog': "(try socrates grade -h, "
-                          "socrates batch -h, or "
+                          "socrates batch -h, "
+                          "socrates serve -h, or "
                           "socrates submit -h)"}
 
     top_parser = argparse.ArgumentParser(**top_opts)
@@ -39,6 +40,19 @@ def get_args():
     norm_mode_parser.add_argument('--no-late',
                                   help="do not check for late submissions",
                                   action='store_true')
+    norm_mode_parser.add_argument('--cache-results',
+                                  help="reuse the results of tests that "
+                                       "already ran on the same files",
+                                  action='store_true')
+    norm_mode_parser.add_argument('--client',
+                                  help="send the files to a running "
+                                       "'socrates serve' to be graded "
+                                       "(implies --assume-missing)",
+                                  action='store_true')
+    norm_mode_parser.add_argument('--socket',
+                                  help="the server's socket (default: "
+                                       "server_socket from the "
+                                       "configuration file)")
 
 
     # parser for batch mode
@@ -61,6 +75,70 @@ def get_args():
     batch_mode_parser.add_argument('--no-late',
                                    help="do not check for late submissions",
                                    action='store_true')
+    batch_mode_parser.add_argument('--cache-results',
+                                   help="reuse the results of tests that "
+                                        "already ran on the same files",
+                                   action='store_true')
+    batch_mode_parser.add_argument('--dedup',
+                                   help="run the tests of identical files "
+                                        "only once, grading submissions "
+                                        "whose files all duplicate others' "
+                                        "last (implies --cache-results)",
+                                   action='store_true')
+    batch_mode_parser.add_argument('-j', '--jobs',
+                                   help="number of submissions to grade at "
+                                        "once (default: 1)",
+                                   type=_positive_int, default=1)
+    batch_mode_parser.add_argument('--log-dir',
+                                   help="directory in which to save the "
+                                        "output of each submission when "
+                                        "grading more than one at once "
+                                        "(default: socrates-logs)",
+                                   default='socrates-logs')
+    batch_mode_parser.add_argument('--journal',
+                                   help="file to which each graded "
+                                        "submission is recorded as soon as "
+                                        "it is finished (default: "
+                                        "socrates-journal.jsonl)",
+                                   default='socrates-journal.jsonl')
+    batch_mode_parser.add_argument('--resume',
+                                   help="skip the submissions that the "
+                                        "journal shows were already graded",
+                                   action='store_true')
+
+    batch_how = batch_mode_parser.add_mutually_exclusive_group()
+    batch_how.add_argument('--in-process',
+                           help="load the criteria once and grade each "
+                                "submission in a forked copy of this "
+                                "process",
+                           action='store_true')
+    batch_how.add_argument('--client',
+                           help="send each submission to a running "
+                                "'socrates serve' to be graded (implies "
+                                "--assume-missing)",
+                           action='store_true')
+
+    batch_mode_parser.add_argument('--socket',
+                                   help="the server's socket (default: "
+                                        "server_socket from the "
+                                        "configuration file)")
+
+
+    # parser for serve mode
+    serve_mode_opts = {'description': "Grade submissions sent by "
+                                      "'socrates grade --client' and "
+                                      "'socrates batch --client', keeping "
+                                      "criteria loaded between them"}
+    serve_mode_parser = subparsers.add_parser('serve', **serve_mode_opts)
+
+    serve_mode_parser.add_argument('--socket',
+                                   help="the socket to listen on (default: "
+                                        "server_socket from the "
+                                        "configuration file)")
+    serve_mode_parser.add_argument('-j', '--jobs',
+                                   help="number of submissions to grade at "
+                                        "once (default: 1)",
+                                   type=_positive_int, default=1)
 
 
     # parser for submit mode
@@ -97,5 +175,17 @@ def get_args():
     return args
 
 
+def _positive_int(string):
+    try:
+        value = int(string)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid integer: " + repr(string))
+
+    if value < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+
+    return value
+
+
 if __name__ == '__main__':
     print("To use socrates, run the 'socrates' module.")
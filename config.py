@@ -33,6 +33,10 @@ dropbox_dir = _parser.get('socrates', 'dropbox_dir',
                           fallback=SOCRATES_DIR + os.sep + 'dropbox')
 criteria_dir = _parser.get('socrates', 'criteria_dir',
                            fallback=SOCRATES_DIR + os.sep + 'criteria')
+cache_dir = _parser.get('socrates', 'cache_dir',
+                        fallback=SOCRATES_DIR + os.sep + 'cache')
+server_socket = _parser.get('socrates', 'server_socket',
+                            fallback=cache_dir + os.sep + 'socrates.sock')
 
 from datetime import timedelta as _td
 if _parser.has_option('socrates', 'grace_period'):
@@ -7,6 +7,13 @@ import config
 
 DATE_FORMAT = '%B %d, %Y %I:%M %p'
 
+# libyaml's C parser is much faster than the pure-Python one; both loaders
+# construct the same objects, as yaml.load() always has
+if yaml.__with_libyaml__:
+    YAML_LOADER = yaml.CLoader
+else:
+    YAML_LOADER = yaml.Loader
+
 
 class Criteria:
     """Represents requirements for student submissions."""
@@ -125,9 +132,32 @@ class Criteria:
         """
         import hooks
 
-        file = open(path, 'r')
-        crit_dict = yaml.load(file)
+        crit_dict = _load_yaml(path)
 
         hooks.load_from_dict(crit_dict)
 
         return Criteria(crit_dict)
+
+
+def _load_yaml(path):
+    """Return the dictionary in the YAML file at 'path'. Parsing YAML with
+    the pure-Python parser is slow, so parsed dictionaries are cached by the
+    contents of the file and the version of the parser; the cached copy is
+    used until the file changes. The dictionary is still validated (by
+    constructing a Criteria object) every time it is loaded.
+    """
+    import cache
+
+    with open(path, 'r') as f:
+        source = f.read()
+
+    key = cache.make_key(source, yaml.__version__)
+    cached = cache.load('criteria', key)
+
+    if cached is not None:
+        return cached
+
+    crit_dict = yaml.load(source, Loader=YAML_LOADER)
+    cache.store('criteria', key, crit_dict)
+
+    return crit_dict
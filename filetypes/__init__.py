@@ -1,49 +1,75 @@
-__all__ = ['basefile', 'plainfile', 'pythonfile', 'picobotfile',
-           'logisimfile', 'hmmmfile', 'jflapfile']
+import yaml
 
 from filetypes import basefile
 from filetypes import basetest
-from filetypes import *
-
-
-def _traverse(cls):
-    """Given a root class object (any subclass of BaseFile), add this class to
-    the _file_handlers dictionary and its subclasses, recursively. For each
-    test type that the file type supports, add it to the _test_handlers
-    dictionary, keyed by a (file type YAML keyword, test type YAML keyword) pair.
-    """
-    _file_handlers[cls.yaml_type] = cls
-
-    for t in cls.supported_tests:
-        _test_handlers[(cls.yaml_type, t.yaml_type)] = t
-
-    for subcls in cls.__subclasses__():
-        _traverse(subcls)
 
+# maps each file type in criteria files to the module in this package that
+# implements it and the name of its subclass of BaseFile; a module is only
+# imported when a criteria file first uses one of its file types, so that
+# (e.g.) grading a plain-text assignment never imports the logisim package
+_file_modules = {'plain': ('plainfile', 'PlainFile'),
+                 'python': ('pythonfile', 'PythonFile'),
+                 'picobot': ('picobotfile', 'PicobotFile'),
+                 'logisim': ('logisimfile', 'LogisimFile'),
+                 'hmmm': ('hmmmfile', 'HMMMFile'),
+                 'jflap': ('jflapfile', 'JFLAPFile')}
 
 _file_handlers = dict()
 _test_handlers = dict()
-for subcls in basefile.BaseFile.__subclasses__():
-    _traverse(subcls)
 
 
 def find_file_class(file_type):
     """Given a file type specified by a criteria file, find the appropriate
-    subclass of BaseFile that can handle that type. The class is returned, or
-    ValueError is raised if the file type is not supported.
+    subclass of BaseFile that can handle that type, importing the module
+    that defines it if necessary. The class is returned, or ValueError is
+    raised if the file type is not supported.
     """
-    try:
+    import importlib
+
+    if file_type in _file_handlers:
         return _file_handlers[file_type]
-    except KeyError:
+
+    try:
+        module_name, class_name = _file_modules[file_type]
+    except (KeyError, TypeError):
         raise ValueError("unsupported file type '{}'".format(file_type))
 
+    module = importlib.import_module('filetypes.' + module_name)
+    cls = getattr(module, class_name)
+
+    _file_handlers[file_type] = cls
+
+    for t in cls.supported_tests:
+        _test_handlers[(file_type, t.yaml_type)] = t
+
+    return cls
+
 
 def find_test_class(file_type, test_type):
     """Given a test type specified by a criteria file, find the appropriate
     subclass of BaseTest that implements the test. The class is returned, or
     ValueError is raised if the test type is not supported.
     """
+    find_file_class(file_type)
+
     try:
         return _test_handlers[(file_type, test_type)]
     except KeyError:
         raise ValueError("unsupported test type '{}'".format(test_type))
+
+
+def _object_constructor(loader, suffix, node):
+    """Construct a CriteriaObject from an '!object' tag in a criteria file.
+    The constructor must be registered before any criteria file is loaded,
+    but the pythonfile module is only imported when it is needed.
+    """
+    from filetypes.pythonfile import crit_obj_constructor
+    return crit_obj_constructor(loader, suffix, node)
+
+
+yaml.add_multi_constructor(u'!object', _object_constructor)
+
+# criteria are loaded with libyaml's loader when it is available
+if yaml.__with_libyaml__:
+    yaml.add_multi_constructor(u'!object', _object_constructor,
+                               Loader=yaml.CLoader)
@@ -2,7 +2,19 @@ class BaseTest:
     # the test's type from the YAML file (e.g., 'review')
     yaml_type = None
 
+    # whether the test's result depends only on its definition, the
+    # submission file, and the files given by dependencies(), so that it
+    # can be cached (tests that prompt the grader cannot be)
+    cacheable = True
+
+    # set by run() when the result it just returned depended on something
+    # else (e.g., a wall-clock time limit), so that it is not cached
+    transient = False
+
     def __init__(self, dict_, file_type=None):
+        # the test as the criteria file defines it
+        self.definition = dict_
+
         if 'description' in dict_:
             self.description = dict_['description'].strip()
         else:
@@ -21,5 +33,28 @@ class BaseTest:
         raise NotImplementedError()
 
 
+    def dependencies(self):
+        """Return a list of paths to the files (other than the submission)
+        whose contents this test's result depends on, such as solution
+        files in the static directory.
+        """
+        return []
+
+
+    def cache_key(self):
+        """Return a key identifying everything this test's result depends
+        on besides the submission: its definition in the criteria file
+        (with its keys in a fixed order, so that reordering them does not
+        change the key) and the contents of its dependencies. If there is
+        no such key (see cache.canonical()), cache.CacheKeyError is raised.
+        """
+        import cache
+
+        parts = [cache.canonical(self.definition)]
+        parts += [cache.file_hash(path) for path in self.dependencies()]
+
+        return cache.make_key(*parts)
+
+
     def __str__(self):
         return "'{}' test of".format(self.yaml_type)
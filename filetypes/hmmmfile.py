@@ -4,11 +4,40 @@ from filetypes.basetest import BaseTest
 import filetypes
 import util
 import hmc                              # for HMMM assembler and simulator
+from hmc.errors import SimulationError, StepLimitError, TimeLimitError
+
+# default limits for each eval test; a criteria file may override these
+# with an eval test's 'max_steps' and 'timeout' (in seconds)
+MAX_STEPS = 10 ** 6
+TIMEOUT = 60
 
 
 def _not_boring(s):
     return s.strip() not in ['', '\t', '\n']
 
+
+def _assemble(path):
+    """Assemble the HMMM program at 'path', returning the machine code
+    (None if it does not assemble) and the assembler's error messages.
+    Results are cached by the contents of the file and the version of
+    the assembler, so an identical program is only assembled once.
+    """
+    import cache
+
+    with open(path) as f:
+        source = f.read()
+
+    key = cache.make_key(source, hmc.hmmmAssembler.VERSION)
+    cached = cache.load('hmmm', key)
+
+    if cached is not None:
+        return cached
+
+    code, errors = hmc.assemble_source(source)
+    cache.store('hmmm', key, (code, errors))
+
+    return code, errors
+
 class HMMMEvalTest(BaseTest):
     yaml_type = 'eval'
 
@@ -23,6 +52,19 @@ class HMMMEvalTest(BaseTest):
         # since the debugger is switched off by us
         if 'input' in dict_:
             self.input = dict_['input']
+        else:
+            self.input = None
+
+        # limits on how long the program may run
+        if 'max_steps' in dict_:
+            self.max_steps = dict_['max_steps']
+        else:
+            self.max_steps = MAX_STEPS
+
+        if 'timeout' in dict_:
+            self.timeout = dict_['timeout']
+        else:
+            self.timeout = TIMEOUT
 
         # store expected output; this may be an exact string or a regex
         if 'output' in dict_:
@@ -38,48 +80,57 @@ class HMMMEvalTest(BaseTest):
 
     def run(self, _):
         import io
-        import sys
 
         util.info("running HMMM test")
 
-        if self.input is not None:
-            in_buf = io.StringIO(self.input)
-            sys.stdin = in_buf
+        machine = hmc.HmmmMachine()
+        machine.load(self.file.machine_code)
 
-        if self.output is not None:
-            out_buf = io.StringIO()
-            sys.stdout = out_buf
+        out_buf = io.StringIO()
 
         try:
-            hmc.run(self.file.binary_name, debug=False)
-        except KeyboardInterrupt:
-            sys.stdin, sys.stdout = sys.__stdin__, sys.__stdout__
+            machine.run(self.input or '', max_steps=self.max_steps,
+                        timeout=self.timeout, stdout=out_buf)
+        except (StepLimitError, TimeLimitError) as err:
+            util.warning("failing test because the program " + str(err))
 
+            # how far a program gets before a time limit depends on the
+            # machine, so the result is not cached
+            if type(err) is TimeLimitError:
+                self.transient = True
+
+            notes = ["program " + str(err)]
+            if self.output is not None:
+                notes += filter(_not_boring,
+                                out_buf.getvalue().split('\n')[-5:-1])
+
+            return {'deduction': self.deduction,
+                    'description': self.description,
+                    'notes': notes}
+
+        except KeyboardInterrupt:
             desc = "test failed because the grader halted the program"
             util.warning(desc)
 
+            self.transient = True
+
             err = filter(_not_boring, out_buf.getvalue().split('\n')[-5:-1])
 
             return {'deduction': self.deduction,
                     'description': self.description,
                     'notes': [desc] + list(err)}
 
-        except SystemExit:
-            sys.stdin, sys.stdout = sys.__stdin__, sys.__stdout__
+        except SimulationError as err:
+            util.warning("failing test because the simulator stopped "
+                         "with an error")
 
-            util.warning("failing test because the simulator exited uncleanly")
-
-            err = filter(_not_boring, out_buf.getvalue().split('\n')[-5:-1])
+            out = filter(_not_boring, out_buf.getvalue().split('\n')[-5:-1])
 
             return {'deduction': self.deduction,
-                    'description': "simluator exited with an error",
-                    'notes': err}
+                    'description': "simulator exited with an error",
+                    'notes': list(out) + str(err).split('\n')}
 
-        # restore default standard in/out
-        sys.stdin, sys.stdout = sys.__stdin__, sys.__stdout__
-
-        if self.output is not None:
-            output = out_buf.getvalue()
+        output = out_buf.getvalue()
 
         passed = True
         if self.output is not None:
@@ -119,6 +170,7 @@ class HMMMFile(PlainFile):
     extensions = ['hmmm']
     supported_tests = PlainFile.supported_tests.copy()
     supported_tests.append(HMMMEvalTest)
+    engine_version = '1.' + hmc.hmmmAssembler.VERSION
 
 
     def __init__(self, dict_):
@@ -149,30 +201,23 @@ class HMMMFile(PlainFile):
         to a buffer and comparing it to the expected output.
         """
 
-        import os
-        import random
-        from functools import reduce
+        code, errors = _assemble(self.path)
 
-        chars = [str(i) for i in range(10)] + \
-                [chr(ord('a') + i) for i in range(26)]
-
-        rand = reduce(str.__add__, [random.choice(chars) for _ in range(32)])
-        self.binary_name = rand
-
-        if not hmc.assemble(self.path, self.binary_name):
+        if code is None:
             return [{'deduction': self.error_deduction,
                      'description': "error assembling '{}'".format(self.path),
-                     'notes': ["did not assemble"]}]
+                     'notes': ["did not assemble"] + errors}]
+
+        self.machine_code = code
 
         results = []
         for test in self.tests:
-            result = test.run(self.path)
+            result = self.run_test(test, self.path)
 
             if result is not None:
                 results.append(result)
 
-        os.remove(self.binary_name)
-        self.binary_name = None
+        self.machine_code = None
 
         return results
 
@@ -5,6 +5,33 @@ import filetypes
 import util
 import logisim                          # for parsing Logisim .circ files
 
+MAX_TABLE_INPUTS = 16                   # truth tables have 2^n rows
+MAX_ROWS_SHOWN = 8                      # failing rows listed in the notes
+
+
+def _load(path, circuit_names, use_cache=False):
+    """Build the named circuits in the Logisim file at 'path', returning a
+    logisim.LogisimFile object. If 'use_cache' is True, results are cached
+    by the contents of the file, the circuit names, and the version of the
+    logisim package, so regrading an unchanged file does not parse it again.
+    """
+    import cache
+
+    if not use_cache:
+        return logisim.load(path, circuit_names)
+
+    key = cache.make_key(cache.file_hash(path), logisim.VERSION,
+                         *circuit_names)
+    cached = cache.load('logisim', key)
+
+    if cached is not None:
+        return cached
+
+    logisim_file = logisim.load(path, circuit_names)
+    cache.store('logisim', key, logisim_file)
+
+    return logisim_file
+
 
 class LogisimReviewTest(ReviewTest):
     def __init__(self, dict_, file_type):
@@ -108,10 +135,232 @@ class EvalTest(BaseTest):
                     'notes': desc}
 
 
+class TruthTableTest(BaseTest):
+    """A test that evaluates a circuit for every combination of values of
+    some of its input pins, and compares each row of the resulting truth
+    table against a table in the criteria file or against a reference
+    circuit in a .circ file in the static directory. All rows are
+    evaluated at once, using one bit of a Python integer for each row.
+    """
+    yaml_type = 'truth_table'
+
+    def __init__(self, dict_):
+        super().__init__(dict_)
+        self.inputs = dict_['inputs']
+        self.outputs = dict_['outputs']
+
+        # pins the submission being graded has under alternate labels,
+        # mapping the labels in the criteria to the ones used instead;
+        # the criteria's lists of labels are never changed
+        self.reset_pins()
+
+        if 'table' in dict_:
+            self.expected = _parse_table(dict_['table'], len(self.inputs),
+                                         len(self.outputs))
+
+        elif 'reference' in dict_:
+            if 'reference_circuit' in dict_:
+                name = dict_['reference_circuit']
+            else:
+                name = None
+
+            self.expected = self.__eval_reference(dict_['reference'], name)
+
+        else:
+            raise ValueError("truth table test needs a 'table' or a "
+                             "'reference' circuit")
+
+    def __check_labels(self, labels, type_):
+        if type(labels) is not list or len(labels) == 0:
+            raise ValueError("truth table {} pins must be a non-empty "
+                             "list".format(type_))
+
+        if not all(map(lambda l: type(l) is str, labels)):
+            raise ValueError("truth table {} pin labels must be "
+                             "strings".format(type_))
+
+        if len(set(labels)) != len(labels):
+            raise ValueError("truth table {} pin labels must be "
+                             "unique".format(type_))
+
+    @property
+    def inputs(self):
+        return self._inputs
+
+    @inputs.setter
+    def inputs(self, new_inputs):
+        self.__check_labels(new_inputs, 'input')
+
+        if len(new_inputs) > MAX_TABLE_INPUTS:
+            raise ValueError("truth tables can have at most {} input "
+                             "pins".format(MAX_TABLE_INPUTS))
+
+        self._inputs = new_inputs
+
+    @property
+    def outputs(self):
+        return self._outputs
+
+    @outputs.setter
+    def outputs(self, new_outputs):
+        self.__check_labels(new_outputs, 'output')
+        self._outputs = new_outputs
+
+    def rename_output_pin(self, old, new):
+        if old in self.outputs:
+            self.__renamed_outputs[old] = new
+
+    def rename_input_pin(self, old, new):
+        if old in self.inputs:
+            self.__renamed_inputs[old] = new
+
+    def reset_pins(self):
+        """Forget the pins renamed for the last submission, so that the
+        test uses the labels in the criteria again.
+        """
+        self.__renamed_inputs = {}
+        self.__renamed_outputs = {}
+
+    def dependencies(self):
+        import os
+        import config
+
+        if 'reference' in self.definition:
+            return [config.static_dir + os.sep +
+                    self.definition['reference']]
+
+        return []
+
+    def __eval_reference(self, file_name, circuit_name):
+        """Evaluate a circuit from a .circ file in the static directory
+        and return its truth table, in the form _parse_table() returns.
+        Rows in which the reference circuit has no value are not checked.
+        """
+        import os
+        import config
+
+        path = config.static_dir + os.sep + file_name
+        if not os.path.isfile(path):
+            raise ValueError("reference circuit file '{}' "
+                             "cannot be found".format(file_name))
+
+        if circuit_name is None:
+            # use the file's only circuit
+            reference_file = logisim.load(path)
+
+            if len(reference_file.circuits) != 1:
+                raise ValueError("reference file '{}' does not have exactly "
+                                 "one circuit; specify 'reference_circuit'"
+                                 .format(file_name))
+
+            circuit_name = list(reference_file.circuits)[0]
+
+        else:
+            reference_file = logisim.load(path, [circuit_name])
+
+        circuit = reference_file.get_circuit(circuit_name)
+        if circuit is None:
+            raise ValueError("reference circuit {} cannot be found in "
+                             "'{}'".format(repr(circuit_name), file_name))
+
+        return _eval_table(circuit, self.inputs, self.outputs)
+
+    def run(self, circuit):
+        """Given a logisim.Circuit object, evaluate it for every
+        combination of values of the test's input pins (other input pins
+        are left without values), and report the rows of the truth table
+        for which it does not produce the expected output.
+        """
+        from logisim.errors import DuplicatePinLabelError, \
+                                   NoSuchPinLabelError
+
+        util.info("running truth table test on '{}'".format(circuit.name))
+
+        inputs = [self.__renamed_inputs.get(l, l) for l in self.inputs]
+        outputs = [self.__renamed_outputs.get(l, l) for l in self.outputs]
+
+        label_errors = []
+        for labels, get_pin, type_ in \
+                [(inputs, circuit.get_input_pin, 'input'),
+                 (outputs, circuit.get_output_pin, 'output')]:
+            for label in labels:
+                try:
+                    get_pin(label)
+                except DuplicatePinLabelError:
+                    label_errors.append("duplicate label: " + repr(label))
+                except NoSuchPinLabelError:
+                    label_errors.append("missing " + repr(label) + \
+                                        " ({} pin)".format(type_))
+
+        if label_errors:
+            return {'deduction': self.deduction,
+                    'description': "could not evaluate the truth table",
+                    'notes': label_errors}
+
+        actual = _eval_table(circuit, inputs, outputs)
+
+        num_rows = 1 << len(inputs)
+
+        # the rows that are checked but do not have the expected value
+        failed = 0
+        for (ones, known), (expected, checked) in zip(actual, self.expected):
+            failed |= checked & ~(known & ~(ones ^ expected))
+
+        if not failed:
+            return None
+
+        notes = []
+        num_failed = bin(failed).count('1')
+
+        for row in range(num_rows):
+            if not failed >> row & 1:
+                continue
+
+            if len(notes) == MAX_ROWS_SHOWN:
+                notes.append("(and {} more)".format(num_failed -
+                                                    MAX_ROWS_SHOWN))
+                break
+
+            notes.append(self.__describe_row(row, actual, inputs, outputs))
+
+        desc = "did not produce the correct output for {} of {} input " \
+               "combinations".format(num_failed, num_rows)
+
+        return {'deduction': self.deduction,
+                'description': desc,
+                'notes': notes}
+
+    def __describe_row(self, row, actual, inputs, outputs):
+        def pin_strs(labels, bits):
+            strs = []
+            for label, bit in zip(labels, bits):
+                if bit is None:
+                    strs.append(repr(label) + " without a value")
+                else:
+                    strs.append(repr(label) + (" on" if bit else " off"))
+
+            return ", ".join(strs)
+
+        def bit(ones, known):
+            return bool(ones >> row & 1) if known >> row & 1 else None
+
+        n = len(inputs)
+        input_bits = [bool(row >> (n - 1 - i) & 1) for i in range(n)]
+
+        expected = [(label, bit(ones, checked)) for label, (ones, checked)
+                    in zip(outputs, self.expected)]
+        expected = [(l, b) for l, b in expected if b is not None]
+
+        return "given " + pin_strs(inputs, input_bits) + \
+               ": expected " + pin_strs(*zip(*expected)) + \
+               "; got " + pin_strs(outputs, [bit(*a) for a in actual])
+
+
 class LogisimFile(BaseFile):
     yaml_type = 'logisim'
     extensions = ['circ']
-    supported_tests = [LogisimReviewTest, EvalTest]
+    supported_tests = [LogisimReviewTest, EvalTest, TruthTableTest]
+    engine_version = '1.' + logisim.VERSION
 
     def __init__(self, dict_):
         BaseFile.__init__(self, dict_)
@@ -125,9 +374,11 @@ class LogisimFile(BaseFile):
         self.circuits = circuits
 
     def run_tests(self):
+        import json
         from logisim.errors import NoValueGivenError
 
-        logisim_file = logisim.load(self.path)
+        logisim_file = _load(self.path, [c.name for c in self.circuits],
+                             self.cache_results)
         broken = logisim_file.broken
 
         results = dict()
@@ -187,6 +438,11 @@ class LogisimFile(BaseFile):
                                    'notes': without_labels})
                 continue
 
+            # pins renamed for an earlier submission must not carry over
+            for t in c.tests:
+                if type(t) is TruthTableTest:
+                    t.reset_pins()
+
             # check that the circuit has the pins we require
             label_errors = _check_labels(c, circuit)
             if label_errors:
@@ -199,10 +455,14 @@ class LogisimFile(BaseFile):
                                    'notes': label_errors})
                 continue
 
+            # a test's result also depends on which circuit it runs on,
+            # and on the labels of the circuit's pins
+            context = (c.name, json.dumps(c.alternate_labels, sort_keys=True))
+
             # actually run any tests
             try:
                 for t in c.tests:
-                    result = t.run(circuit)
+                    result = self.run_test(t, circuit, context=context)
                     if result:
                         outer_result = {'description': str(c) + \
                                                        " failed a test"}
@@ -368,6 +628,67 @@ def _build_description(inputs, outputs):
         return "\n".join(in_strs) + "\n".join(out_strs)
 
 
+def _eval_table(circuit, inputs, outputs):
+    """Evaluate a logisim.Circuit for every combination of values of the
+    input pins labeled in 'inputs'. Row r of the table has the values in
+    the bits of r, with the first input pin in the most significant bit.
+    Return a list with a (ones, known) tuple of bit masks for each output
+    pin labeled in 'outputs' (see Circuit.eval_bits()).
+    """
+    n = len(inputs)
+    width = 1 << n
+    full = (1 << width) - 1
+
+    input_dict = {}
+    for i, label in enumerate(inputs):
+        # the pattern of this input's bit repeats every 'period' rows:
+        # first 'half' rows off, then 'half' rows on
+        half = 1 << (n - 1 - i)
+        period = 2 * half
+        block = ((1 << half) - 1) << half
+        input_dict[label] = block * (full // ((1 << period) - 1))
+
+    output_vals = circuit.eval_bits(input_dict, width)
+
+    return [output_vals[circuit.get_output_pin(label)] for label in outputs]
+
+
+def _parse_table(rows, num_inputs, num_outputs):
+    """Given a truth table from a criteria file (a list of strings, each
+    with the bits of the input pins, a space, and the bits of the output
+    pins; e.g., "011 10"), return a list with a (ones, checked) tuple of
+    bit masks for each output pin, in the form _eval_table() returns.
+    Outputs given as 'x' and rows missing from the table are not checked.
+    """
+    if type(rows) is not list:
+        raise ValueError("truth table must be a list of rows")
+
+    outputs = [[0, 0] for _ in range(num_outputs)]
+    seen = set()
+
+    for row in rows:
+        parts = str(row).split()
+        if len(parts) != 2 or len(parts[0]) != num_inputs or \
+           len(parts[1]) != num_outputs or \
+           not set(parts[0]) <= {'0', '1'} or \
+           not set(parts[1]) <= {'0', '1', 'x'}:
+            raise ValueError("invalid truth table row: " + repr(row))
+
+        r = int(parts[0], 2)
+        if r in seen:
+            raise ValueError("duplicate truth table row: " + repr(row))
+
+        seen.add(r)
+
+        for out, bit in zip(outputs, parts[1]):
+            if bit != 'x':
+                out[1] |= 1 << r
+            if bit == '1':
+                out[0] |= 1 << r
+
+    return [tuple(out) for out in outputs]
+
+
 def _get_pin_with_label(pins, label):
     for pin in pins:
         if pin.label == label:
@@ -397,10 +718,9 @@ def _check_labels(c, circuit):
                         # try another alternate
                         continue
                     else:
-                        # found a working alternate
-                        index = c.output_pins.index(label)
-                        c.output_pins[index] = alt
-
+                        # found a working alternate; the circuit's
+                        # pins are left alone, since the next
+                        # submission may use the original label
                         for t in c.tests:
                             t.rename_output_pin(label, alt)
 
@@ -431,10 +751,9 @@ def _check_labels(c, circuit):
                         # try another alternate
                         continue
                     else:
-                        # found a working alternate
-                        index = c.input_pins.index(label)
-                        c.input_pins[index] = alt
-
+                        # found a working alternate; the circuit's
+                        # pins are left alone, since the next
+                        # submission may use the original label
                         for t in c.tests:
                             t.rename_input_pin(label, alt)
 
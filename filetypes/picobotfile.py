@@ -6,6 +6,9 @@ import util
 
 MAX_STEPS = 1e5
 
+# the value of a map test's 'starts' that starts Picobot from every blank cell
+ALL_STARTS = 'all'
+
 NUM_ROWS = 25
 NUM_COLS = 25
 
@@ -13,6 +16,22 @@ BLANK = 0           # don't change to > 0; sums depend on this
 VISITED = 1
 WALL = 2
 
+# bits of a cell's surroundings code, set when there is a wall in that
+# direction (visited cells count as blank)
+SURR_N = 8
+SURR_E = 4
+SURR_W = 2
+SURR_S = 1
+
+# for each direction, the bit of the surroundings code that blocks a move
+# that way, and the change in a cell's index (in the flat map) it causes
+# (the direction 'x' means staying put)
+MOVES = {'n': (SURR_N, -NUM_COLS),
+         'e': (SURR_E, 1),
+         'w': (SURR_W, -1),
+         's': (SURR_S, NUM_COLS),
+         'x': (0, 0)}
+
 
 def _parse_map(path):
     f = open(path, 'r')
@@ -38,7 +57,77 @@ def _parse_map(path):
         raise ValueError("map has at least one row not {} "
                          "columns wide".format(NUM_COLS))
 
-    return map_list
+    # store the map row by row in a flat array: the cell at row r and
+    # column c is at index r * NUM_COLS + c
+    return bytes(cell for row in map_list for cell in row)
+
+
+
+def _surroundings_codes(cells):
+    """Given a flat map, return the surroundings code of every cell. Since
+    walls never move, this only needs to be done once per map. The edges of
+    the map count as walls.
+    """
+    codes = bytearray(len(cells))
+
+    for i in range(len(cells)):
+        r, c = divmod(i, NUM_COLS)
+
+        if r == 0 or cells[i - NUM_COLS] == WALL:
+            codes[i] |= SURR_N
+        if c == NUM_COLS - 1 or cells[i + 1] == WALL:
+            codes[i] |= SURR_E
+        if c == 0 or cells[i - 1] == WALL:
+            codes[i] |= SURR_W
+        if r == NUM_ROWS - 1 or cells[i + NUM_COLS] == WALL:
+            codes[i] |= SURR_S
+
+    return bytes(codes)
+
+
+
+class PicobotMap:
+    """A parsed Picobot map. A map is never changed after it is loaded, so
+    one map can be shared by any number of simulations; each simulation
+    marks the cells Picobot visits in its own copy of the cells, returned
+    by new_cells().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.cells = _parse_map(path)
+        self.surroundings = _surroundings_codes(self.cells)
+        self.total_blank = self.cells.count(BLANK)
+
+
+    def new_cells(self):
+        """Return a fresh, writable copy of the map's cells."""
+        return bytearray(self.cells)
+
+
+
+# maps that have been loaded, by path, modification time, and size
+_maps = {}
+
+
+def _load_map(path):
+    """Return the PicobotMap for the map file at 'path', parsing it again
+    only if the file has changed since it was last loaded (e.g., while
+    'socrates serve' is running).
+    """
+    import os
+
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+
+    if key not in _maps:
+        # a map that has changed will never be needed again
+        for old_key in [k for k in _maps if k[0] == path]:
+            del _maps[old_key]
+
+        _maps[key] = PicobotMap(path)
+
+    return _maps[key]
 
 
 
@@ -153,6 +242,56 @@ def _parse_rules(path):
 
 
 
+def _compile_rules(rules):
+    """Given a rules dictionary, return a dense transition table and a list
+    of the states used by the rules. Each state is given a compact index
+    (its position in the list, with the start state, 0, always at index 0),
+    so that the table's size depends on how many states the rules use, not
+    on how large their numbers are. The entry for a state and a
+    surroundings code is at index index * 16 + code. It is None if no rule
+    applies; otherwise, it is a tuple of the direction to move, the
+    surroundings bit that blocks that move, the change in Picobot's index
+    in the flat map, and the index of the new state.
+    """
+    states = {0}
+    for prestate in rules:
+        states.add(prestate)
+        states.update(new[1] for new in rules[prestate].values() if new)
+
+    states = sorted(states)
+    index = {state: i for i, state in enumerate(states)}
+
+    table = [None] * (len(states) * 16)
+
+    for prestate in rules:
+        for surr, new in rules[prestate].items():
+            if not new:
+                continue
+
+            postdir, poststate = new
+            bit, delta = MOVES[postdir.lower()]
+            table[index[prestate] * 16 + _surr_code(surr)] = \
+                (postdir, bit, delta, index[poststate])
+
+    return table, states
+
+
+
+def _surr_code(surr):
+    """Convert a surroundings tuple (n, e, w, s) to a surroundings code."""
+    n, e, w, s = surr
+    return (SURR_N if n == WALL else 0) | (SURR_E if e == WALL else 0) | \
+           (SURR_W if w == WALL else 0) | (SURR_S if s == WALL else 0)
+
+
+
+def _surr_tuple(code):
+    """Convert a surroundings code to a surroundings tuple (n, e, w, s)."""
+    return tuple(WALL if code & bit else BLANK
+                 for bit in [SURR_N, SURR_E, SURR_W, SURR_S])
+
+
+
 def _surr_str(surr):
     n = 'N' if surr[0] else 'X'
     e = 'E' if surr[1] else 'X'
@@ -189,8 +328,8 @@ def _print_map(map, r=-1, c=-1):
     """
 
     i, j = 0, 0
-    for line in map:
-        for cell in line:
+    for start in range(0, len(map), NUM_COLS):
+        for cell in map[start:start + NUM_COLS]:
             if cell == BLANK:
                 if i == r and j == c:
                     ch = 'P'
@@ -228,19 +367,58 @@ class MapTest(BaseTest):
 
         self.error_deduction = dict_['error_deduction']
 
-        map_path = config.static_dir + os.sep + dict_['map']
-        if not os.path.isfile(map_path):
-            raise ValueError("Picobot map file '{}' "
-                             "cannot be found".format(map_path))
-
-        self.map = _parse_map(map_path)
-
-        # parse starting location
-        pattern = re.compile("\(?(\d+)\s*,\s*(\d+)\)?")
-        result = re.search(pattern, dict_['start'])
+        # a test may use one map or a list of maps
+        if 'maps' in dict_:
+            map_names = dict_['maps']
+        else:
+            map_names = [dict_['map']]
+
+        self.maps = []
+        self.map_paths = []
+        for name in map_names:
+            map_path = config.static_dir + os.sep + name
+            if not os.path.isfile(map_path):
+                raise ValueError("Picobot map file '{}' "
+                                 "cannot be found".format(map_path))
+
+            self.maps.append((name, _load_map(map_path)))
+            self.map_paths.append(map_path)
+
+        # parse starting locations; a test may use one starting location,
+        # a list of them, or start Picobot from every blank cell
+        if 'starts' in dict_:
+            starts = dict_['starts']
+        else:
+            starts = [dict_['start']]
 
-        x, y = int(result.group(1)), int(result.group(2))
-        self.start = (x, y)
+        if starts == ALL_STARTS:
+            self.starts = ALL_STARTS
+        else:
+            pattern = re.compile("\(?(\d+)\s*,\s*(\d+)\)?")
+
+            self.starts = []
+            for start in starts:
+                result = re.search(pattern, start)
+                if not result:
+                    raise ValueError("invalid Picobot starting location "
+                                     "'{}'".format(start))
+
+                x, y = int(result.group(1)), int(result.group(2))
+                self.starts.append((x, y))
+
+            for r, c in self.starts:
+                if not (0 <= r < NUM_ROWS and 0 <= c < NUM_COLS):
+                    raise ValueError("Picobot starting location ({}, {}) "
+                                     "is outside the map".format(r, c))
+
+            # Picobot can still be started from a wall, as it always could,
+            # but that is most likely a mistake in the criteria
+            for name, map_ in self.maps:
+                for r, c in self.starts:
+                    if map_.cells[r * NUM_COLS + c] != BLANK:
+                        util.warning("Picobot starting location ({}, {}) "
+                                     "is not a blank cell in map "
+                                     "'{}'".format(r, c, name))
 
         # parse deduction ratios
         self.deductions = dict()
@@ -248,17 +426,57 @@ class MapTest(BaseTest):
             self.deductions[Fraction(ratio)] = deduction
 
 
+    def dependencies(self):
+        return self.map_paths
+
+
     def run(self, path):
         """Given a path to the Picobot file containing a list of
-        Picobot rules, simulate the action of Picobot on a map and return
-        a deduction as necessary, dependent on Picobot's map coverage.
+        Picobot rules, simulate the action of Picobot on each map from each
+        starting location and return a deduction as necessary, dependent on
+        Picobot's worst map coverage.
         """
+        from array import array
+
+        # the maps are looked up again, since one may have changed since
+        # the criteria were loaded
+        self.maps = [(name, _load_map(map_path))
+                     for (name, _), map_path in zip(self.maps, self.map_paths)]
 
         try:
-            coverage, num_steps = self.__simulate(path)
+            rules = _parse_rules(path)
+            if len(rules) == 0:
+                raise EmptyRulesError()
+
+            # the rules are only compiled once for all of the simulations
+            table, states = _compile_rules(rules)
+
+            # and one buffer for finding loops is shared by all of them
+            size = len(states) * max(len(m.cells) for _, m in self.maps)
+            unseen = array('l', [-1]) * size
+            seen = array('l', unseen)
+
+            runs = []
+            for name, map_ in self.maps:
+                if self.starts == ALL_STARTS:
+                    starts = [divmod(i, NUM_COLS)
+                              for i in range(len(map_.cells))
+                              if map_.cells[i] == BLANK]
+                else:
+                    starts = self.starts
 
-            util.info("finished Picobot simulation "
-                        "in {:,} steps".format(num_steps))
+                for start in starts:
+                    try:
+                        coverage, num_steps, stuck = self.__simulate(
+                            table, states, map_, start, seen, unseen)
+                    except (WallError, NoRuleError) as err:
+                        if self.__num_runs() > 1:
+                            err.args = ("{} (starting at ({}, {}) on map "
+                                        "'{}')".format(err, start[0],
+                                                       start[1], name),)
+                        raise
+
+                    runs.append((coverage, num_steps, stuck, start, name))
 
         except PicobotSyntaxError as err:
             return {'description': self.description,
@@ -281,6 +499,22 @@ class MapTest(BaseTest):
                     'deduction': self.error_deduction,
                     'notes': [str(err)]}
 
+        # the deduction depends on the worst run
+        coverage, num_steps, stuck, start, name = min(runs,
+                                                      key=lambda x: x[0])
+
+        if len(runs) == 1:
+            if stuck:
+                util.info("stopped Picobot simulation after {:,} steps "
+                          "because Picobot is stuck in a loop".format(
+                              num_steps))
+            else:
+                util.info("finished Picobot simulation "
+                            "in {:,} steps".format(num_steps))
+        else:
+            util.info("finished {:,} Picobot simulations in {:,} "
+                      "steps".format(len(runs), sum(x[1] for x in runs)))
+
         import fractions
         ratios = sorted(self.deductions.keys())
 
@@ -305,79 +539,114 @@ class MapTest(BaseTest):
                                 "({:.2%})".format(coverage,
                                 coverage.numerator / coverage.denominator)]}
 
-            result['notes'].append("finished in {:,} steps".format(num_steps))
-            if num_steps >= MAX_STEPS:
-                result['notes'].append("reached maximum steps during "
-                                       "simulation")
+            if len(runs) > 1:
+                mean = sum(x[0] for x in runs) / len(runs)
+                result['notes'][0] = "worst " + result['notes'][0]
+                result['notes'].append("worst run started at ({}, {}) on "
+                                       "map '{}'".format(start[0], start[1],
+                                                         name))
+                result['notes'].append("mean coverage over {:,} runs: "
+                                       "{:.2%}".format(len(runs),
+                                       mean.numerator / mean.denominator))
+
+            if stuck:
+                result['notes'].append("stuck in a loop after {:,} "
+                                       "steps".format(num_steps))
+            else:
+                result['notes'].append("finished in {:,} "
+                                       "steps".format(num_steps))
+                if num_steps >= MAX_STEPS:
+                    result['notes'].append("reached maximum steps during "
+                                           "simulation")
 
             return result
 
 
-    def __simulate(self, path):
-        rules = _parse_rules(path)
-        if len(rules) == 0:
-            raise EmptyRulesError()
+    def __num_runs(self):
+        if self.starts == ALL_STARTS:
+            return sum(m.total_blank for _, m in self.maps)
+
+        return len(self.starts) * len(self.maps)
 
+
+    def __simulate(self, table, states, map_, start, seen, unseen):
+        """Simulate Picobot on a map from a starting location, using the
+        table of rules and list of states returned by _compile_rules().
+        'seen' is a buffer used to find loops, which is reset to the
+        contents of 'unseen' first; both hold at least one entry for each
+        state at each cell of the map. Return Picobot's coverage of the
+        map, the number of steps taken, and whether the simulation was
+        stopped because Picobot is stuck in a loop.
+        """
         from fractions import Fraction
-        from functools import reduce
 
         # note: (row, column) notation is used here for uniformity:
         # row 0 is the *top* row and column 0 is the *left* edge
-        # this matches exactly how the map is stored in self.map
-        r, c = self.start
-
-        def blanks(row):
-            return sum(map(lambda x: not x, row))
-
-        total_blank = reduce(int.__add__, map(blanks, self.map))
+        # this matches exactly how the map's cells are stored
+        r, c = start
+        pos = r * NUM_COLS + c
+
+        cells = map_.new_cells()
+        codes = map_.surroundings
+
+        # a start on a wall turns that cell into a visited one, which
+        # Picobot can move back into, so the cells around it need their
+        # own surroundings codes for this simulation
+        if cells[pos] != BLANK:
+            codes = bytearray(codes)
+            if r > 0:
+                codes[pos - NUM_COLS] &= ~SURR_S
+            if c < NUM_COLS - 1:
+                codes[pos + 1] &= ~SURR_W
+            if c > 0:
+                codes[pos - 1] &= ~SURR_E
+            if r < NUM_ROWS - 1:
+                codes[pos + NUM_COLS] &= ~SURR_N
+
+        total_blank = map_.total_blank
         num_blank = total_blank
 
-        def surroundings(r, c):
-            n = self.map[r - 1][c]
-            e = self.map[r][c + 1]
-            w = self.map[r][c - 1]
-            s = self.map[r + 1][c]
-
-            # ignore visited surroundings
-            n = BLANK if n == VISITED else n
-            e = BLANK if e == VISITED else e
-            w = BLANK if w == VISITED else w
-            s = BLANK if s == VISITED else s
-
-            return (n, e, w, s)
-
-        def move(r, c, dir):
-            if dir in ['n', 'N']: r -= 1
-            if dir in ['e', 'E']: c += 1
-            if dir in ['w', 'W']: c -= 1
-            if dir in ['s', 'S']: r += 1
-            return r, c
-
-        self.map[r][c] = VISITED
+        cells[pos] = VISITED
         num_blank -= 1                  # initial location counts as visited
         state = 0
 
+        # Picobot's moves depend only on its state and position, so if it
+        # is ever in the same state at the same position twice without
+        # visiting a new cell in between, it will repeat the same moves
+        # forever and never visit another cell; 'seen' holds, for each
+        # state and position, the value of num_blank when Picobot was last
+        # there (num_blank only changes when a new cell is visited)
+        num_cells = len(cells)
+        seen[:] = unseen
+
         i = 0
         while num_blank > 0 and i < MAX_STEPS:
+            key = state * num_cells + pos
+            if seen[key] == num_blank:
+                return (1 - Fraction(num_blank, total_blank), i, True)
+            seen[key] = num_blank
+
             i += 1
 
-            new = rules[state][surroundings(r, c)]
+            code = codes[pos]
+            new = table[state * 16 + code]
             if not new:
-                raise NoRuleError(state, surroundings(r, c))
+                raise NoRuleError(states[state], _surr_tuple(code))
+
+            dir, bit, delta, new_state = new
 
-            new_r, new_c = move(r, c, new[0])
+            if code & bit:
+                raise WallError(states[state], _surr_tuple(code), dir)
 
-            if self.map[new_r][new_c] == WALL:
-                raise WallError(state, surroundings(r, c), new[0])
+            pos += delta
 
-            if self.map[new_r][new_c] == BLANK:
-                self.map[new_r][new_c] = VISITED
+            if cells[pos] == BLANK:
+                cells[pos] = VISITED
                 num_blank -= 1
 
-            r, c = new_r, new_c
-            state = new[1]
+            state = new_state
 
-        return (1 - Fraction(num_blank, total_blank), i)
+        return (1 - Fraction(num_blank, total_blank), i, False)
 
 
     def __str__(self):
@@ -390,6 +659,7 @@ class PicobotFile(PlainFile):
     extensions = ['txt', 'picobot']
     supported_tests = PlainFile.supported_tests.copy()
     supported_tests.append(MapTest)
+    engine_version = '1'
 
 
     def __init__(self, dict_):
@@ -409,7 +679,7 @@ class PicobotFile(PlainFile):
     def run_tests(self):
         results = []
         for t in self.tests:
-            result = t.run(self.path)
+            result = self.run_test(t, self.path)
             if result is not None:
                 results.append(result)
 
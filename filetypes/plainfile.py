@@ -30,6 +30,7 @@ def _print_file(path):
 
 class ReviewTest(BaseTest):
     yaml_type = 'review'
+    cacheable = False
 
     def __init__(self, dict_, file_type):
         super().__init__(dict_, file_type)
@@ -124,6 +125,10 @@ class DiffTest(BaseTest):
         self.against = config.static_dir + os.sep + dict_['against']
 
 
+    def dependencies(self):
+        return [self.against]
+
+
     def run(self, submission):
         import filecmp
 
@@ -142,6 +147,7 @@ class PlainFile(BaseFile):
     supported_tests = BaseFile.supported_tests.copy()
     supported_tests.append(DiffTest)
     supported_tests.append(ReviewTest)
+    engine_version = '1'
 
     def __init__(self, dict_):
         BaseFile.__init__(self, dict_)
@@ -156,7 +162,7 @@ class PlainFile(BaseFile):
     def run_tests(self):
         results = []
         for t in self.tests:
-            result = t.run(self.path)
+            result = self.run_test(t, self.path)
 
             if result:
                 if type(result) is list:
@@ -1,15 +1,18 @@
 import sys
-import yaml
 
 import filetypes
 from filetypes.plainfile import PlainFile, ReviewTest
 from filetypes.basefile import TestSet, BaseFile
 from filetypes.basetest import BaseTest
+from sandbox import Sandbox, SandboxError
 import util
 
 MAX_STACK_SIZE = sys.getrecursionlimit()
 BASIC_TYPES = [str, int, float, bool, list, dict, type(None)]
 
+# the keys allowed in a Python file's 'sandbox' mapping in a criteria file
+SANDBOX_LIMITS = ['timeout', 'cpu_time', 'memory']
+
 
 class CriteriaObject:
     """An object type specified by the criteria is represented using an
@@ -27,7 +30,53 @@ def crit_obj_constructor(loader, suffix, node):
     attrs = loader.construct_mapping(node)
     return CriteriaObject(class_name=class_name, attrs=attrs)
 
-yaml.add_multi_constructor(u'!object', crit_obj_constructor)
+
+class SandboxedModule:
+    """Stands in for a student's module that was imported only in a
+    Sandbox worker, so that none of its code runs in the grader's process.
+    Tests are given this object instead of the module; it holds what the
+    grader needs to know about the module (found by _describe_module() in
+    the worker), and the sandbox in which everything else is run.
+    """
+    def __init__(self, name, description, sandbox):
+        self.__name__ = name
+        self.sandbox = sandbox
+
+        # maps function names to (parameter names, source code) tuples
+        self.functions = description['functions']
+
+        # maps class names to dicts like self.functions for their methods
+        self.classes = description['classes']
+
+        self.variables = description['variables']
+        self.module_source = description['source']
+
+
+    def parameters(self, target):
+        """Return the names of the parameters of the student's function or
+        method for the PythonFunction or PythonMethod, or None if the
+        module does not have it.
+        """
+        member = self.__find(target)
+        return member[0] if member else None
+
+
+    def function_source(self, target):
+        """Return the source code of the student's function or method for
+        the PythonFunction or PythonMethod, or None if the module does not
+        have it (or its source cannot be found).
+        """
+        member = self.__find(target)
+        return member[1] if member else None
+
+
+    def __find(self, target):
+        if type(target) is PythonMethod:
+            members = self.classes.get(target.class_name, {})
+        else:
+            members = self.functions
+
+        return members.get(target.name)
 
 
 class ScriptTest(BaseTest):
@@ -52,28 +101,27 @@ class ScriptTest(BaseTest):
 
         self._name = new_name
 
+    def dependencies(self):
+        import os
+        import config
+
+        return [config.scripts_dir + os.sep + self.name]
+
     def run(self, module):
         from os import sep
-        from imp import reload
         import config
 
-        globals = {module.__name__: module, 'config': config}
-
-        with open(config.scripts_dir + sep + self.name, 'r') as f:
-            code = f.read()
+        path = config.scripts_dir + sep + self.name
 
         try:
-            exec(code, globals)
+            if type(module) is SandboxedModule:
+                return module.sandbox.call(_run_script, path)
+            else:
+                return _run_script(module, path)
         except:
             from util import exit, ERR_SCRIPT_RUNTIME_ERROR
             exit(ERR_SCRIPT_RUNTIME_ERROR)
 
-        if '_socrates_result' not in globals:
-            from util import exit, ERR_SCRIPT_RUNTIME_ERROR
-            exit(ERR_SCRIPT_RUNTIME_ERROR)
-
-        return globals['_socrates_result']
-
 
 class EvalTest(BaseTest):
     yaml_type = 'eval'
@@ -96,8 +144,10 @@ class EvalTest(BaseTest):
             self.deduction = dict_['deduction']
 
         # add optional components, if present (except 'arguments' and
-        # 'output', which are special and handled below)
-        for a in ['input', 'value', 'random_seed']:
+        # 'output', which are special and handled below); 'timeout' is
+        # only allowed in a file with a sandbox, since the sandbox's
+        # worker is what enforces it (see PythonFile)
+        for a in ['input', 'value', 'random_seed', 'timeout']:
             if a in dict_:
                 setattr(self, a, dict_[a])
             else:
@@ -150,6 +200,12 @@ class EvalTest(BaseTest):
                                              self.deduction)
 
 
+    @property
+    def cacheable(self):
+        # a test that asks the grader to confirm its failure cannot be
+        return not self.prompt
+
+
     def run(self, cxt):
         util.info("running eval test on {}".format(self.target))
 
@@ -167,20 +223,14 @@ class EvalTest(BaseTest):
 
 
     def __run_function(self, context):
-        import sys
-        import io
-        import random
-
         mod_name = context.__name__
         fn_name = self.target.name
         testing_method = type(self.target) is PythonMethod
 
-        before = self.before
-
-        if before and type(before) is CriteriaObject:
-            before = _convert_using_cxt(context, before)
+        sandboxed = type(context) is SandboxedModule
 
-        args = self.__get_args(mod_name, context)
+        # criteria objects are converted where the function actually runs
+        args = self.__get_args(mod_name, context, convert=not sandboxed)
 
         if type(args) is tuple:
             return {'deduction': self.deduction,
@@ -190,18 +240,15 @@ class EvalTest(BaseTest):
                               "(expected {}, submission has {})".format(
                               args[0], args[1])]}
 
-        locals = {mod_name: context}
         vars = util.ALPHABET[:len(args)]
         args_strings = []
 
         for i in range(len(vars)):
-            locals[vars[i]] = args[i][1]
             args_strings.append("{}={}".format(args[i][0], vars[i]))
 
         fn_call = "{}({})".format(fn_name, ', '.join(args_strings))
 
         if testing_method:
-            locals["obj"] = before
             code = "obj." + fn_call
         else:
             code = mod_name + "." + fn_call
@@ -209,62 +256,56 @@ class EvalTest(BaseTest):
         if not self.description:
             self.description = self.__build_description()
 
-        # redirect standard in to buffer
-        if self.input is not None:
-            in_buf = io.StringIO(self.input)
-        else:
-            in_buf = io.StringIO()
+        call = {'code': code,
+                'arguments': {vars[i]: args[i][1] for i in range(len(vars))},
+                'before': self.before if testing_method else None,
+                'after': self.after if testing_method else None,
+                'value': self.value,
+                'input': self.input,
+                'random_seed': self.random_seed}
 
-        sys.stdin = in_buf
+        try:
+            if not sandboxed:
+                outcome = _call_in_context(context, call)
+            else:
+                outcome = context.sandbox.call(_call_in_context, call,
+                                               timeout=self.timeout)
 
-        # redirect standard out to buffer
-        out_buf = io.StringIO()
-        sys.stdout = out_buf
+        except SandboxError as err:
+            util.warning("failing a test: " + str(err).strip())
 
-        if self.random_seed:
-            random.seed(self.random_seed)
+            # time and memory limits depend on the machine
+            self.transient = True
+
+            return {'deduction': self.deduction,
+                    'description': self.description,
+                    'notes': [str(err).strip().split('\n')[-1]]}
 
-        try:
-            return_value = eval(code, globals(), locals)
         except KeyboardInterrupt:
-            sys.stdin, sys.stdout = sys.__stdin__, sys.__stdout__
+            outcome = {'interrupted': True}
 
+        if outcome['interrupted']:
             util.warning("interrupting a test")
+            self.transient = True
 
             return {'deduction': self.deduction,
                     'description': self.description,
                     'notes': ["test was interrupted by the grader"]}
-        except:
-            import sys
-            err = sys.exc_info()
-
-            sys.stdin, sys.stdout = sys.__stdin__, sys.__stdout__
 
-            util.warning("failing a test due to an error ({})".format(err[1]))
+        if outcome['error'] is not None:
+            util.warning("failing a test due to an error "
+                         "({})".format(outcome['error']))
 
             return {'deduction': self.deduction,
                     'description': self.description,
-                    'notes': [str(err[1]) + " (" + str(err[0].__name__) + ")"]}
+                    'notes': [outcome['error']]}
 
-        # restore default standard in/out
-        sys.stdin, sys.stdout = sys.__stdin__, sys.__stdout__
+        output = outcome['output']
 
-        if self.output is not None:
-            output = out_buf.getvalue()
-
-        passed = True
-        if self.value is not None:
-            passed = passed and self.value == return_value
+        passed = outcome['value_matches'] and outcome['after_matches']
         if self.output is not None:
             passed = passed and self.__output_matches(output)
 
-        # if we are testing a method and there are post-state requirements
-        # for the method, fail the test if the object doesn't match the
-        # required post-state
-        if testing_method and self.after is not None:
-            if not _attributes_equal(locals["obj"], self.after):
-                passed = False
-
         if passed:
             return None
         else:
@@ -277,16 +318,16 @@ class EvalTest(BaseTest):
                     s = "where '{}' is {}".format(arg, _safe_str(val))
                     result['notes'].append(s)
 
-            if testing_method and before is not None:
+            if testing_method and self.before is not None:
                 result['notes'].append("called object before "
                                        "the method call: "
-                                       "{}".format(_safe_str(before)))
+                                       "{}".format(_safe_str(self.before)))
 
             if self.value is not None:
                 result['notes'].append("expected value: " + \
                                        _safe_str(self.value))
                 result['notes'].append("produced value: " + \
-                                       _safe_str(return_value))
+                                       outcome['value'])
 
             if self.output is not None and type(self.output) is str:
                 result['notes'].append("expected output:")
@@ -382,7 +423,7 @@ class EvalTest(BaseTest):
         return None
 
 
-    def __get_args(self, mod_name, cxt):
+    def __get_args(self, mod_name, cxt, convert=True):
         """Given a particular module context (the student's submitted
         module, after being imported), construct and return a list of
         tuples (n, m) such that all n are the parameter names used by
@@ -396,15 +437,19 @@ class EvalTest(BaseTest):
         number of parameters, a tuple (a, b) is returned, where a is the
         expected number of parameters and b is the student's number of
         parameters. For methods, this function does not return a tuple
-        containing "self".
+        containing "self". If 'convert' is False, CriteriaObject objects
+        are left for the caller to convert.
         """
         if not self.arguments:
             return []
 
-        from inspect import signature
+        if type(cxt) is SandboxedModule:
+            student_param_names = list(cxt.parameters(self.target))
+        else:
+            from inspect import signature
 
-        func_obj = _find_function_from_cxt(cxt, self.target)
-        student_param_names = list(signature(func_obj).parameters)
+            func_obj = _find_function_from_cxt(cxt, self.target)
+            student_param_names = list(signature(func_obj).parameters)
 
         # for methods, we should remove "self" from the
         # parameter list
@@ -424,7 +469,7 @@ class EvalTest(BaseTest):
             param_name = self.target.parameters[i]
             arg_val = self.__get_arg_value(param_name)
 
-            if type(arg_val) is CriteriaObject:
+            if convert and type(arg_val) is CriteriaObject:
                 arg_val = _convert_using_cxt(cxt, arg_val)
 
             args.append((student_param_names[i], arg_val))
@@ -433,21 +478,31 @@ class EvalTest(BaseTest):
 
 
     def __run_variable(self, context):
-        import sys
-        import io
-
-        mod_name = context.__name__
         var_name = self.target.name
-        exp = mod_name + "." + var_name
 
         try:
-            value = eval(exp, globals(), {mod_name:context})
-        except AttributeError as err:
+            if type(context) is SandboxedModule:
+                outcome = context.sandbox.call(_check_variable, var_name,
+                                               self.value,
+                                               timeout=self.timeout)
+            else:
+                outcome = _check_variable(context, var_name, self.value)
+
+        except SandboxError as err:
+            util.warning("failing a test: " + str(err).strip())
+
+            self.transient = True
+
             return {'deduction': self.deduction,
                     'description': self.description,
-                    'notes': [str(err)]}
+                    'notes': [str(err).strip().split('\n')[-1]]}
 
-        if value == self.value:
+        if outcome['error'] is not None:
+            return {'deduction': self.deduction,
+                    'description': self.description,
+                    'notes': [outcome['error']]}
+
+        if outcome['value_matches']:
             return None
         else:
             result = {'deduction': self.deduction,
@@ -455,31 +510,27 @@ class EvalTest(BaseTest):
                       'notes': []}
 
             result['notes'].append("expected value: " + str(self.value))
-            result['notes'].append("produced value: " + str(value))
+            result['notes'].append("produced value: " + outcome['value'])
 
             return result
 
 
     def __run_module(self, context):
-        import sys
-        import io
-        import imp
-
-        if self.input:
-            in_buf = io.StringIO(self.input)
-            sys.stdin = in_buf
-
-        if self.output:
-            out_buf = io.StringIO()
-            sys.stdout = out_buf
+        if type(context) is not SandboxedModule:
+            output = _reload_in_context(context, self.input)
+        else:
+            try:
+                output = context.sandbox.call(_reload_in_context, self.input,
+                                              timeout=self.timeout)
 
-        imp.reload(context)
+            except SandboxError as err:
+                util.warning("failing a test: " + str(err).strip())
 
-        # restore default standard in/out
-        sys.stdin, sys.stdout = sys.__stdin__, sys.__stdout__
+                self.transient = True
 
-        if self.output is not None:
-            output = out_buf.getvalue()
+                return {'deduction': self.deduction,
+                        'description': self.description,
+                        'notes': [str(err).strip().split('\n')[-1]]}
 
         passed = True
         if self.output is not None:
@@ -548,22 +599,30 @@ class PythonReviewTest(ReviewTest):
 
         elif type(self.target) in [PythonFunction, PythonMethod]:
             import inspect
-            func_obj = _find_function_from_cxt(context, self.target)
 
-            if not func_obj:
+            if type(context) is SandboxedModule:
+                func_src = context.function_source(self.target)
+            else:
+                func_obj = _find_function_from_cxt(context, self.target)
+                func_src = inspect.getsource(func_obj) if func_obj else None
+
+            if func_src is None:
                 return {'deduction': self.deduction,
                         'description': self.description,
                         'notes': ["could not find {}".format(self.target)]}
 
             if self.print_target:
-                temp.write(inspect.getsource(func_obj).encode('utf-8'))
+                temp.write(func_src.encode('utf-8'))
                 temp.flush()
 
         elif type(self.target) is PythonVariable:
             import inspect
             import re
 
-            mod_src = inspect.getsource(context)
+            if type(context) is SandboxedModule:
+                mod_src = context.module_source
+            else:
+                mod_src = inspect.getsource(context)
 
             # TODO find a better way to do this
             pat = re.compile("\s*" + self.target.name + "\s*=")
@@ -595,6 +654,8 @@ class PythonFile(PlainFile):
     supported_tests.append(EvalTest)
     supported_tests.append(ScriptTest)
 
+    engine_version = '1'
+
 
     def __init__(self, dict_):
         BaseFile.__init__(self, dict_)
@@ -603,11 +664,22 @@ class PythonFile(PlainFile):
         self.classes = []
         self.variables = []
 
+        # while only some tests can be cached, the parts of the key shared
+        # by each test's cached result (see run_tests())
+        self.__test_key_parts = None
+
         if 'error_deduction' in dict_:
             self.error_deduction = dict_['error_deduction']
         else:
             self.error_deduction = None
 
+        # if present, eval tests are run in a separate process with
+        # these limits (see the 'sandbox' module)
+        if 'sandbox' in dict_:
+            self.sandbox = dict_['sandbox']
+        else:
+            self.sandbox = None
+
         if 'tests' in dict_:
             for t in dict_['tests']:
                 test_cls = filetypes.find_test_class(PythonFile.yaml_type,
@@ -630,6 +702,17 @@ class PythonFile(PlainFile):
         for test in self.tests:
             test.target = self
 
+        # without a sandbox, nothing could stop a test at its time limit
+        if self.sandbox is None:
+            for test in self.__all_tests():
+                members = test.members if type(test) is TestSet else [test]
+
+                for m in members:
+                    if type(m) is EvalTest and m.timeout is not None:
+                        raise ValueError("eval test {} has a timeout, but "
+                                         "timeouts require a sandbox for "
+                                         "'{}'".format(m, self.path))
+
         if 'point_value' in dict_:
             self.point_value = dict_['point_value']
         else:
@@ -637,14 +720,144 @@ class PythonFile(PlainFile):
                                sum([v.point_value for v in self.variables])
 
 
+    @property
+    def sandbox(self):
+        return self._sandbox
+
+    @sandbox.setter
+    def sandbox(self, new_sandbox):
+        if new_sandbox is True:
+            new_sandbox = {}
+
+        if new_sandbox is not None:
+            if type(new_sandbox) is not dict:
+                raise ValueError("sandbox must be true or a dict of limits")
+
+            for key in new_sandbox:
+                if key not in SANDBOX_LIMITS:
+                    raise ValueError("invalid sandbox limit '{}'; should "
+                                     "be one of {}".format(key,
+                                     SANDBOX_LIMITS))
+
+        self._sandbox = new_sandbox
+
+
     def run_tests(self):
+        """Import the student's module and run every test of this file and
+        its functions, classes, and variables. The tests share the module
+        (and anything they change in it), so results are cached for the
+        file as a whole rather than for each test; since the module may
+        import others beside it, or read files beside it, the key includes
+        every file in its directory (see __directory_hash()). If some of
+        the tests cannot be cached (e.g., a review test), the module is
+        imported and those tests are run every time, but the results of
+        the others are cached one at a time, under keys that also depend
+        on the whole file's definition and on each test's place in it.
+        """
+        import cache
+
+        tests = self.__all_tests()
+
+        if not self.cache_results:
+            return self.__import_and_run_tests()
+
+        try:
+            key_parts = [cache.canonical(self.definition),
+                         self.__directory_hash()]
+        except (OSError, cache.CacheKeyError):
+            return self.__import_and_run_tests()
+
+        if not all(t.cacheable for t in tests):
+            self.__test_key_parts = key_parts
+            try:
+                return self.__import_and_run_tests()
+            finally:
+                self.__test_key_parts = None
+
+        try:
+            key = cache.make_key(self.yaml_type, self.engine_version,
+                                 *key_parts,
+                                 *[t.cache_key() for t in tests])
+        except (OSError, cache.CacheKeyError):
+            return self.__import_and_run_tests()
+
+        cached = cache.load('results', key)
+        if cached is not None:
+            util.info("using cached results for " + str(self))
+            return cached[0]
+
+        for t in tests:
+            t.transient = False
+
+        results = self.__import_and_run_tests()
+
+        if not any(t.transient for t in tests):
+            cache.store('results', key, (results,))
+
+        return results
+
+
+    def __run_test(self, test, module_context):
+        """Run one of this file's tests on the module, caching its result
+        with BaseFile.run_test() while only some tests can be cached (see
+        run_tests()).
+        """
+        if self.__test_key_parts is None:
+            return test.run(module_context)
+
+        place = str(self.__all_tests().index(test))
+        return self.run_test(test, module_context,
+                             context=self.__test_key_parts + [place])
+
+
+    def __all_tests(self):
+        """Return a list of the tests of this file and of its functions,
+        classes' methods, and variables.
+        """
+        tests = list(self.tests)
+
+        for target in self.functions + self.variables:
+            tests += target.tests
+
+        for cls in self.classes:
+            for method in cls.methods:
+                tests += method.tests
+
+        return tests
+
+
+    def __directory_hash(self):
+        """Return a hash of the names and contents of the files in the
+        directory containing this file and in its subdirectories, which
+        the module or its tests may import or read. Grade files and
+        Python's bytecode caches are left out, since grading itself
+        creates them.
+        """
+        import os
+        import cache
+
+        directory = os.path.dirname(self.path) or os.curdir
+
+        parts = []
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+
+            for name in sorted(files):
+                if name.endswith('-grade.txt'):
+                    continue
+
+                path = os.path.join(root, name)
+                parts += [os.path.relpath(path, directory),
+                          cache.file_hash(path)]
+
+        return cache.make_key(*parts)
+
+
+    def __import_and_run_tests(self):
         import sys
         import io
         import os
 
-        results = dict()
-        results[self] = []
-
         actual_setrecursionlimit = sys.setrecursionlimit
 
         def intercept_stacksize_change(new_val):
@@ -663,12 +876,15 @@ class PythonFile(PlainFile):
 
         sys.setrecursionlimit = intercept_stacksize_change
 
-        try:
-            directory, name = os.path.split(self.path)
-            mod_name = name[:name.index('.py')] if '.py' in name else name
+        directory, name = os.path.split(self.path)
+        mod_name = name[:name.index('.py')] if '.py' in name else name
 
-            sys.path.append(directory)
+        sys.path.append(directory)
 
+        if self.sandbox is not None:
+            return self.__run_tests_in_sandbox(mod_name)
+
+        try:
             util.info("importing module '{}'".format(mod_name))
 
             # redirect standard out to empty buffer to "mute" the program
@@ -691,24 +907,80 @@ class PythonFile(PlainFile):
 
             traceback.print_exc()
 
-            if self.error_deduction:
-                deduction = self.error_deduction
-            else:
-                deduction = self.point_value
+            return self.__import_failed("encountered "
+                                        "{}".format(err[0].__name__))
 
-            util.warning("deducting {} points for import "
-                         "error".format(deduction))
+        return self.__run_tests_on(module_context)
 
-            return [{'deduction': deduction,
-                     'description': "error importing '{}'".format(self.path),
-                     'notes': ["encountered {}".format(err[0].__name__)]}]
+
+    def __run_tests_in_sandbox(self, mod_name):
+        """Import the student's module in a Sandbox worker, under the
+        sandbox's limits, and run every test against a SandboxedModule
+        standing in for it. The module is never imported in the grader's
+        process, so its top-level code cannot hang or crash the grader.
+        """
+        sandbox = Sandbox(mod_name, **self.sandbox)
+
+        try:
+            util.info("importing module '{}' in a sandbox".format(mod_name))
+
+            sandbox.start()
+            description = sandbox.call(_describe_module)
+
+        except SandboxError as err:
+            sandbox.close()
+
+            message = str(err).strip().split('\n')[-1]
+            util.error("encountered an error importing '{}' module "
+                       "in a sandbox ({})".format(mod_name, message))
+
+            # time and memory limits depend on the machine
+            if type(err) is not SandboxError:
+                for test in self.__all_tests():
+                    test.transient = True
+
+            return self.__import_failed(message)
+
+        util.info("finished importing module")
+
+        try:
+            return self.__run_tests_on(SandboxedModule(mod_name, description,
+                                                       sandbox))
+        finally:
+            sandbox.close()
+
+
+    def __import_failed(self, note):
+        """Return the results of a file whose module could not be imported,
+        given a note describing what went wrong.
+        """
+        if self.error_deduction:
+            deduction = self.error_deduction
+        else:
+            deduction = self.point_value
+
+        util.warning("deducting {} points for import "
+                     "error".format(deduction))
+
+        return [{'deduction': deduction,
+                 'description': "error importing '{}'".format(self.path),
+                 'notes': [note]}]
+
+
+    def __run_tests_on(self, module_context):
+        """Given the student's imported module, run every test of this
+        file and its functions, classes, and variables, and return a list
+        of the results.
+        """
+        results = dict()
+        results[self] = []
 
         found_functions = self.__get_members(module_context, 'functions')
         found_classes = self.__get_members(module_context, 'classes')
         found_variables = self.__get_members(module_context, 'variables')
 
         for test in self.tests:
-            result = test.run(module_context)
+            result = self.__run_test(test, module_context)
             if result is not None:
                 util.add_to(result, results[self])
 
@@ -726,7 +998,7 @@ class PythonFile(PlainFile):
                     for m in test.members:
                         m.target = func
 
-                result = test.run(module_context)
+                result = self.__run_test(test, module_context)
                 if result is not None:
                     util.add_to(result, results[func])
 
@@ -739,14 +1011,17 @@ class PythonFile(PlainFile):
                 continue
 
             # TODO move this into __get_members
-            cls_obj = _find_class_from_cxt(module_context, cls.name)
-            import inspect
+            if type(module_context) is SandboxedModule:
+                method_names = list(module_context.classes[cls.name])
+            else:
+                import inspect
+
+                cls_obj = _find_class_from_cxt(module_context, cls.name)
+                method_names = [m[0] for m in
+                                inspect.getmembers(cls_obj, inspect.isfunction)]
 
-            found_methods = []
-            for m in inspect.getmembers(cls_obj, inspect.isfunction):
-                for method in cls.methods:
-                    if method.name == m[0]:
-                        found_methods.append(method)
+            found_methods = [method for method in cls.methods
+                             if method.name in method_names]
 
 
             for method in cls.methods:
@@ -764,7 +1039,7 @@ class PythonFile(PlainFile):
                         for m in test.members:
                             m.target = method
 
-                    result = test.run(module_context)
+                    result = self.__run_test(test, module_context)
                     if result is not None:
                         util.add_to(result, results[method])
 
@@ -782,7 +1057,7 @@ class PythonFile(PlainFile):
                     for m in test.members:
                         m.target = var
 
-                result = test.run(module_context)
+                result = self.__run_test(test, module_context)
                 if result is not None:
                     util.add_to(result, results[var])
 
@@ -812,6 +1087,16 @@ class PythonFile(PlainFile):
         import inspect
         members = []
 
+        if type(cxt) is SandboxedModule:
+            if kind == 'functions':
+                names, targets = cxt.functions, self.functions
+            elif kind == 'classes':
+                names, targets = cxt.classes, self.classes
+            elif kind == 'variables':
+                names, targets = cxt.variables, self.variables
+
+            return [t for t in targets if t.name in names]
+
         if kind == 'functions':
             for m in inspect.getmembers(cxt, inspect.isfunction):
                 for f in self.functions:
@@ -908,6 +1193,180 @@ class PythonVariable:
                 'tests': [t.to_dict() for t in self.tests]}
 
 
+def _call_in_context(context, call):
+    """Given a module context and a dict describing a call to a function
+    or method of that module (built by EvalTest), make the call and return
+    a dict describing its outcome. This function runs in the grader's
+    process or, for sandboxed files, in a Sandbox worker, so everything it
+    returns must be picklable. Objects from the student's module are never
+    returned; they are compared against the expected values here.
+    """
+    import io
+    import random
+
+    mod_name = context.__name__
+
+    locals = {mod_name: context}
+    for var, val in call['arguments'].items():
+        if type(val) is CriteriaObject:
+            val = _convert_using_cxt(context, val)
+
+        locals[var] = val
+
+    before = call['before']
+    if type(before) is CriteriaObject:
+        before = _convert_using_cxt(context, before)
+
+    locals["obj"] = before
+
+    outcome = {'interrupted': False,
+               'error': None,
+               'output': None,
+               'value': None,
+               'value_matches': True,
+               'after_matches': True}
+
+    # redirect standard in and standard out to buffers
+    if call['input'] is not None:
+        sys.stdin = io.StringIO(call['input'])
+    else:
+        sys.stdin = io.StringIO()
+
+    out_buf = io.StringIO()
+    sys.stdout = out_buf
+
+    if call['random_seed']:
+        random.seed(call['random_seed'])
+
+    try:
+        return_value = eval(call['code'], globals(), locals)
+    except KeyboardInterrupt:
+        outcome['interrupted'] = True
+        return outcome
+    except:
+        err = sys.exc_info()
+        outcome['error'] = str(err[1]) + " (" + str(err[0].__name__) + ")"
+        return outcome
+    finally:
+        # restore default standard in/out
+        sys.stdin, sys.stdout = sys.__stdin__, sys.__stdout__
+
+    outcome['output'] = out_buf.getvalue()
+    outcome['value'] = _safe_str(return_value)
+
+    if call['value'] is not None:
+        outcome['value_matches'] = bool(call['value'] == return_value)
+
+    if call['after'] is not None:
+        outcome['after_matches'] = _attributes_equal(locals["obj"],
+                                                     call['after'])
+
+    return outcome
+
+
+def _check_variable(context, name, expected):
+    """Given a module context, the name of a variable in it, and the value
+    it should have, return a dict describing the variable's value. Like
+    _call_in_context(), this may run in a Sandbox worker.
+    """
+    outcome = {'error': None,
+               'value': None,
+               'value_matches': False}
+
+    try:
+        value = getattr(context, name)
+    except AttributeError as err:
+        outcome['error'] = str(err)
+        return outcome
+
+    outcome['value'] = str(value)
+    outcome['value_matches'] = bool(value == expected)
+
+    return outcome
+
+
+def _run_script(context, path):
+    """Given a module context and the path to a custom-written script (see
+    ScriptTest), run the script and return the result it leaves in
+    '_socrates_result'. An exception is raised if the script fails or
+    leaves no result. Like _call_in_context(), this may run in a Sandbox
+    worker.
+    """
+    import config
+
+    globals = {context.__name__: context, 'config': config}
+
+    with open(path, 'r') as f:
+        code = f.read()
+
+    exec(code, globals)
+
+    return globals['_socrates_result']
+
+
+def _describe_module(context):
+    """Given a module context, return a dict describing the module's
+    functions, classes, and variables, for a SandboxedModule. This runs in
+    a Sandbox worker, so the description contains only names, parameter
+    names, and source code.
+    """
+    import inspect
+    import types
+
+    def describe_functions(obj):
+        functions = {}
+        for name, func in inspect.getmembers(obj, inspect.isfunction):
+            try:
+                source = inspect.getsource(func)
+            except (OSError, TypeError):
+                source = None
+
+            functions[name] = (list(inspect.signature(func).parameters),
+                               source)
+
+        return functions
+
+    classes = {name: describe_functions(cls)
+               for name, cls in inspect.getmembers(context, inspect.isclass)}
+
+    bad_types = [types.FunctionType, types.LambdaType, types.MethodType,
+                 types.ModuleType]
+    variables = [name for name, value in inspect.getmembers(context)
+                 if type(value) not in bad_types]
+
+    try:
+        source = inspect.getsource(context)
+    except (OSError, TypeError):
+        source = ''
+
+    return {'functions': describe_functions(context),
+            'classes': classes,
+            'variables': variables,
+            'source': source}
+
+
+def _reload_in_context(context, input):
+    """Given a module context and a string to use as standard input (or
+    None), reload the module and return everything it printed.
+    """
+    import io
+    import imp
+
+    if input:
+        sys.stdin = io.StringIO(input)
+
+    out_buf = io.StringIO()
+    sys.stdout = out_buf
+
+    try:
+        imp.reload(context)
+    finally:
+        # restore default standard in/out
+        sys.stdin, sys.stdout = sys.__stdin__, sys.__stdout__
+
+    return out_buf.getvalue()
+
+
 def _find_function_from_cxt(context, target):
     """This function inspects the passed-in context for a function
     or a method using the passed-in target, either a PythonFunction
@@ -8,7 +8,16 @@ from prompt import prompt
 
 
 def grade(criteria, submissions, filename,
-          assume_missing=False, late_check=True):
+          assume_missing=False, late_check=True, cache_results=False,
+          report=None):
+    """Grade the submission files using the criteria, and write the grade
+    file to 'filename'. The number of files declared missing is returned.
+    If 'cache_results' is True, the results of tests that have not changed
+    since they were last run on the same file contents are reused (see
+    BaseFile.run_test()). If 'report' is a dict, it is filled in with the
+    grade as data: 'files' is a list with a dict for each file in the
+    criteria, and 'total' is the final score.
+    """
     found = []
     num_missing = 0
     total = criteria.total_points
@@ -74,22 +83,36 @@ def grade(criteria, submissions, filename,
                     found.append(f)
 
     out = io.StringIO()
+    file_reports = []
 
     try:
         for f in criteria.files:
             out.write(util.heading("{} [{} points]".format(f, f.point_value),
                                    level=2))
 
+            file_report = {'file': str(f), 'path': f.path,
+                           'point_value': f.point_value}
+            file_reports.append(file_report)
+
             if f not in found:
                 total -= f.point_value
                 out.write("-{}\tnot submitted\n".format(f.point_value))
                 out.write("\n\n")
+
+                file_report['submitted'] = False
+                file_report['points_taken'] = f.point_value
                 continue
 
             util.info("running tests for " + str(f))
 
+            f.cache_results = cache_results
+            results = f.run_tests()
+
             points_taken = 0
-            points_taken += write_results(out, f.run_tests())
+            points_taken += write_results(out, results)
+
+            file_report['submitted'] = True
+            file_report['results'] = results
 
             if late_check:
                 file_stat = os.stat(f.path)
@@ -105,7 +128,10 @@ def grade(criteria, submissions, filename,
                     out.write("-{}\tsubmitted late\n".format(adjusted))
                     points_taken += adjusted
 
+                    file_report['late_penalty'] = adjusted
+
             total -= min(f.point_value, points_taken)
+            file_report['points_taken'] = min(f.point_value, points_taken)
 
             out.write("\n")
 
@@ -126,6 +152,10 @@ def grade(criteria, submissions, filename,
         out.seek(0)
         f.write(out.read())
 
+    if report is not None:
+        report['files'] = file_reports
+        report['total'] = total
+
     return num_missing
 
 
@@ -1,18 +1,41 @@
-from imp import reload
-
 import hmc.hmmmAssembler
 import hmc.hmmmSimulator
+from hmc.hmmmSimulator import HmmmMachine
 
 def assemble(file_name, output_name):
-    reload(hmc.hmmmAssembler)
     return hmc.hmmmAssembler.main(file_name, output_name)
 
-def run(file_name, debug=None):
-    reload(hmc.hmmmSimulator)
+def assemble_source(source):
+    """Assemble HMMM source code (a string) in memory. Returns a tuple of
+    the lines of machine code, which can be given to HmmmMachine.load(),
+    and a list of error messages. If the program does not assemble, the
+    machine code is None.
+    """
+    code, triplets = hmc.hmmmAssembler.assembleString(source)
+
+    errors = []
+    for line_num, instruction, line in triplets:
+        if instruction[0] == '*':
+            # e.g., "***SYNTAX ERROR HERE***" becomes "syntax error"
+            kind = instruction.strip('*').replace(' HERE', '').lower()
+            errors.append("line {}: {}: {}".format(line_num, kind, line))
+
+    if code is None and not errors:
+        errors.append("program is empty")
+
+    return code, errors
+
+def run(file_name, debug=None, max_steps=None, timeout=None):
+    """Run the assembled program in the named file. If 'max_steps' is
+    given, hmc.errors.StepLimitError is raised once the program has
+    executed that many instructions; if 'timeout' is given,
+    hmc.errors.TimeLimitError is raised after that many seconds.
+    """
+    limits = {'step_limit': max_steps, 'timeout': timeout}
 
     if debug is True:
-        hmc.hmmmSimulator.main(['-f', file_name, '--debug'])
+        hmc.hmmmSimulator.main(['-f', file_name, '--debug'], **limits)
     elif debug is False:
-        hmc.hmmmSimulator.main(['-f', file_name, '--no-debug'])
+        hmc.hmmmSimulator.main(['-f', file_name, '--no-debug'], **limits)
     else:
-        hmc.hmmmSimulator.main(['-f', file_name])
+        hmc.hmmmSimulator.main(['-f', file_name], **limits)
@@ -0,0 +1,27 @@
+class HMMMError(Exception):
+    pass
+
+class StepLimitError(HMMMError):
+    """Raised when a program executes more instructions than allowed."""
+    def __init__(self, max_steps):
+        self.steps = max_steps
+        HMMMError.__init__(self, "exceeded step limit after executing "
+                                 "{:,} instructions".format(max_steps))
+
+class TimeLimitError(HMMMError):
+    """Raised when a program runs for longer than allowed."""
+    def __init__(self, seconds, steps):
+        self.seconds = seconds
+        self.steps = steps
+        HMMMError.__init__(self, "exceeded time limit of {} seconds after "
+                                 "executing {:,} instructions".format(seconds,
+                                                                      steps))
+
+class LoadError(HMMMError):
+    """Raised when a machine is given a program that cannot be loaded."""
+    pass
+
+class SimulationError(HMMMError):
+    """Raised when a running program does something illegal, such as
+    overflowing a register or jumping outside of the program."""
+    pass
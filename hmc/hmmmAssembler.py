@@ -18,6 +18,10 @@
 import sys, string, re, textwrap
 from hmc.binary import *
 
+# change this whenever a change to the assembler changes its output, so
+# that cached machine code from an older version is not used
+VERSION = "1.5-socrates.1"
+
 #
 # opcodes encodes the preferred opcode translations.  Each entry is a
 # triple: match, mask, translation.  If the binary word matches
@@ -322,9 +326,13 @@ def writefile(machinecode, filename) :
         file.write(triplet[1] + "\n")
     print("")
 
-def main(inputname, outputname) :
-    program = readstring(open(inputname, 'r').read())
-    machinecode = assemble(program)
+def assembleString(S) :
+    """Assemble a program given as a string, without reading or writing
+any files.  Returns a 2-element tuple.  The first element is the list of
+lines of machine code, ready to be loaded into the simulator, or None if
+the program did not assemble.  The second is the list of [line number,
+instruction or error, source line] triplets produced by assemble()."""
+    machinecode = assemble(readstring(S))
 
     # check whether there are any errors
     failure = 0
@@ -332,7 +340,14 @@ def main(inputname, outputname) :
         if triplet[1][0] == '*':
             failure = 1
 
-    if (not machinecode == []) and (not failure):
+    if machinecode == [] or failure:
+        return (None, machinecode)
+    return ([triplet[1] + "\n" for triplet in machinecode], machinecode)
+
+def main(inputname, outputname) :
+    (code, machinecode) = assembleString(open(inputname, 'r').read())
+
+    if code is not None:
         writefile(machinecode, outputname)
         return True
     else:
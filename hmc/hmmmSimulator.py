@@ -15,24 +15,24 @@
 #
 # Moved into 'hmc' package by Alex Breen, October 13, 2014
 # removed "Enter number: " prompt for socrates testing (Alex Breen, Oct. '14)
+# added step and time limits for socrates testing
 
 
-import sys, string, re
+import io, sys, string, re, time
 from hmc.binary import *
+from hmc.errors import LoadError, SimulationError
+from hmc.errors import StepLimitError, TimeLimitError
 from functools import reduce
 
-memory = [0]*256        # 256 words of memory.  Instructions are represented
-                        # ..in string form; data is integer
-register = [0]*16       # 16 integer registers
-pc = 0                  # program counter initialized to 0
 debug = 0               # debug mode?
 ask = 1                 # for fast debug mode
-lpc = 0                 # where the program counter was 1 instruction ago
-codesize = 0            # can't execute past this or read/write before this
 next = 1                # display next instruction?
 register_display = 0    # display the registers graphically?
 memory_display = 0      # display the memory contents graphically?
 
+# how many instructions to execute between checks of the time limit
+TIME_CHECK_INTERVAL = 1024
+
 # translation dictionaries
 
 #
@@ -117,31 +117,26 @@ arguments = {"halt": "",
 def valid_integer(x):
     return -32768 <= x <= 32767 
 
-def disassemble(line):
-    """Disassemble a binary line, returning a @h-element tuple.
-The first tuple element is a string giving the assembly code, the second is
-the mnemonic opcode alone, and the third is a list of arguments, if any,
-in binary encoding."""
-    if type(line) != type(''):
-        return ('***UNTRANSLATABLE INSTRUCTION!***', '***UNTRANSLATABLE***', \
-          [])
-    hex = BinaryToNum(reduce(lambda x, y: x + y, line.strip().split(' ')))
-    for tuple in opcodes:
-        proto = BinaryToNum(reduce(lambda x, y: x + y, tuple[0].split(' ')))
-        mask = BinaryToNum(reduce(lambda x, y: x + y, tuple[1].split(' ')))
+#
+# The opcodes table with its match and mask fields converted to integers
+# once, so that instructions can be decoded without string manipulation.
+#
+decodeTable = tuple((int(match.replace(' ', ''), 2),
+                     int(mask.replace(' ', ''), 2), opcode)
+                    for (match, mask, opcode) in opcodes)
+
+def decodeWord(hex):
+    """Decode an instruction word (an integer), returning a 2-element
+tuple: the mnemonic opcode and a list of arguments, if any."""
+    for (proto, mask, opcode) in decodeTable:
         if hex & mask == proto:
             # We have found the proper instruction.  Decode the arguments.
-            opcode = tuple[2]
-            translation = opcode
             hex <<= 4
             args = []
-            separator = ' '
             for arg in arguments[opcode]:
                 # r s u n z
                 if arg == 'r':
                     val = (hex & 0xf000) >> 12
-                    translation += separator + 'r' + str(val)
-                    separator = ', '
                     hex <<= 4
                     args += [val]
                 elif arg == 'z':
@@ -150,25 +145,344 @@ in binary encoding."""
                     val = (hex & 0xff00) >> 8
                     if arg == 's'  and  (val & 0x80) != 0:
                         val -= 256
-                    translation += separator + str(val)
-                    separator = ', '
-                    hex <<= 8
-                    args += [val]
-                elif arg == 'u':
-                    val = (hex & 0xff00) >> 8
-                    translation += separator + str(val)
-                    separator = ', '
                     hex <<= 8
                     args += [val]
                 elif arg == 'n':
                     # In the absence of other information, always unsigned
                     val = hex & 0xffff
-                    translation += separator + str(val)
-                    separator = ', '
                     hex <<= 16
                     args += [val]
-            return (translation, opcode, args)
-    return ('***UNTRANSLATABLE INSTRUCTION!***', '***UNTRANSLATABLE***', [])
+            return (opcode, args)
+    return ('***UNTRANSLATABLE***', [])
+
+def wordOf(line):
+    """Convert a binary line (e.g., "0001 0001 0000 0101") to an integer."""
+    bits = line.strip().replace(' ', '')
+    return int(bits, 2) if bits else 0
+
+def disassemble(line):
+    """Disassemble a binary line, returning a @h-element tuple.
+The first tuple element is a string giving the assembly code, the second is
+the mnemonic opcode alone, and the third is a list of arguments, if any,
+in binary encoding."""
+    if type(line) != type(''):
+        return ('***UNTRANSLATABLE INSTRUCTION!***', '***UNTRANSLATABLE***', \
+          [])
+    (opcode, args) = decodeWord(wordOf(line))
+    if opcode == '***UNTRANSLATABLE***':
+        return ('***UNTRANSLATABLE INSTRUCTION!***', opcode, [])
+    translation = opcode
+    separator = ' '
+    remaining = list(args)
+    for arg in arguments[opcode]:
+        if arg == 'z':
+            continue
+        val = remaining.pop(0)
+        if arg == 'r':
+            translation += separator + 'r' + str(val)
+        else:
+            translation += separator + str(val)
+        separator = ', '
+    return (translation, opcode, args)
+
+class HmmmMachine(object):
+    """A Harvey Mudd Miniature Machine.  Each machine has its own memory,
+registers and program counter, so several machines can run at once (for
+example, in different threads) without interfering with each other.
+
+Errors in the running program raise hmc.errors.SimulationError instead of
+exiting, and the step and time limits given to run() raise
+hmc.errors.StepLimitError and hmc.errors.TimeLimitError."""
+
+    def __init__(self):
+        self.memory = [0]*256       # 256 words of memory.  Instructions are
+                                    # ..in string form; data is integer
+        self.program = [None]*256   # the instructions, decoded by load()
+        self.register = [0]*16      # 16 integer registers
+        self.codesize = 0           # can't execute past this or read/write
+                                    # ..before this
+        self.pc = 0                 # program counter
+        self.lpc = 0                # where the pc was 1 instruction ago
+        self.steps = 0              # number of instructions executed so far
+        self.stdin = None
+        self.stdout = None
+
+    def load(self, program):
+        """Load a program: a list of lines of machine code, such as those
+written by the assembler (e.g., "0001 0001 0000 0101").  This resets the
+machine's memory, registers and program counter."""
+        if len(program) > len(self.memory):
+            raise LoadError("Program is too large to fit in memory.")
+        for line in program:
+            for c in line:
+                if c not in "01 \n":
+                    raise LoadError("Not a valid binary file.")
+        if len(program) == 0:
+            raise LoadError("Empty file.")
+
+        self.memory[:] = [0]*len(self.memory)
+        self.register[:] = [0]*len(self.register)
+        self.program[:] = [None]*len(self.program)
+        self.codesize = len(program)
+        self.pc = self.lpc = self.steps = 0
+        # instructions can't be changed at run time (stores below codesize
+        # are rejected), so they are decoded once here
+        for i in range(self.codesize):
+            self.memory[i] = program[i]
+            self.program[i] = decode(program[i])
+
+    def run(self, stdin="", max_steps=None, timeout=None, stdout=None,
+            debugger=None):
+        """Run the loaded program until it halts.  'stdin' is the input to
+the program, either a string or a file.  The program's output is written
+to 'stdout' if a file is given; otherwise it is captured and returned as
+a string.  If 'max_steps' is given, StepLimitError is raised once the
+program has executed that many instructions; if 'timeout' is given,
+TimeLimitError is raised after that many seconds.  If a 'debugger' is
+given, it is called with the machine before each instruction executes."""
+        if isinstance(stdin, str):
+            stdin = io.StringIO(stdin)
+        captured = stdout is None
+        if captured:
+            stdout = io.StringIO()
+        self.stdin = stdin
+        self.stdout = stdout
+
+        program = self.program
+        register = self.register
+        codesize = self.codesize
+        pc = self.pc
+        steps = 0
+        if timeout is not None:
+            deadline = time.time() + timeout
+        try:
+            while pc != -1:     # fetch/execute cycle
+                if max_steps is not None and steps >= max_steps:
+                    raise StepLimitError(steps)
+                if timeout is not None and steps % TIME_CHECK_INTERVAL == 0 \
+                  and time.time() > deadline:
+                    raise TimeLimitError(timeout, steps)
+                steps += 1
+                if not 0 <= pc < codesize :
+                    raise SimulationError("Memory Out of Bounds Error.\n"
+                      + "Program attempted to execute memory location "
+                      + str(pc))
+                if debugger is not None :
+                    self.pc = pc
+                    debugger(self)
+                self.lpc = pc
+                (handler, args) = program[pc]   # pre-decoded instruction
+                pc = handler(self, args, pc+1)
+                # Register 0 is always forced to zero
+                register[0] = 0
+        finally:
+            self.pc = pc
+            self.steps = steps
+
+        if captured:
+            return stdout.getvalue()
+
+    def checkOverflow(self, value):
+        if not valid_integer(value):
+            line = self.memory[self.lpc]
+            (translation, opcode, args) = disassemble(line)
+            raise SimulationError("Integer Overflow Error: Result was larger "
+              + "than 16 bits.\n"
+              + "  Program Counter: " + str(self.lpc) + "\n"
+              + "  Instruction: " + opcode + "  Arguments: "
+              + ", ".join(line.split()[1:]) + "\n"
+              + "  Translation: " + translation)
+
+    def checkJump(self, pc, message="Invalid jump target"):
+        if not 0 <= pc < self.codesize:
+            raise SimulationError(message + " at pc " + str(self.lpc)
+              + ": " + str(pc))
+        return pc
+
+    def checkData(self, address, message):
+        if not self.codesize <= address < 256 :
+            raise SimulationError(message + " at pc " + str(self.lpc)
+              + ": " + str(address))
+
+    #
+    # Instruction handlers.  Each takes the list of arguments decoded from
+    # the instruction and the address of the next instruction, and returns
+    # the address of the instruction to execute next (or -1 to halt).
+    # lpc holds the address of the instruction being executed.
+    #
+
+    def doHalt(self, args, pc):
+        return -1               # This terminates the run loop
+
+    def doRead(self, args, pc):
+        self.stdout.flush()
+        input2 = self.readLine()
+        while input2 == "" \
+          or  (not (input2.isdigit() \
+            or (input2[0] == '-' and input2[1:].isdigit()))) \
+          or not valid_integer(int(input2)):
+            self.stdout.write("\n\nIllegal input: number must be in "
+                              "[-32768,32767]\n")
+            self.stdout.write("Enter number (q to quit): ")
+            self.stdout.flush()
+            input2 = self.readLine()
+            if input2 == "q" :
+                raise SimulationError("Program aborted at an input prompt.")
+        self.register[args[0]] = int(input2)
+        return pc
+
+    def readLine(self):
+        line = self.stdin.readline()
+        if line == "" :
+            raise SimulationError("End of input.")
+        return line.rstrip("\n")
+
+    def doWrite(self, args, pc):
+        self.stdout.write(str(self.register[args[0]]) + "\n")
+        return pc
+
+    def doJumpi(self, args, pc):
+        return self.checkJump(self.register[args[0]])
+
+    def doLoadn(self, args, pc):
+        self.register[args[0]] = args[1]
+        return pc
+
+    def doLoad(self, args, pc):
+        self.checkData(args[1], "Invalid load target")
+        self.register[args[0]] = self.memory[args[1]]
+        return pc
+
+    def doStore(self, args, pc):
+        self.checkData(args[1], "Invalid store target")
+        self.memory[args[1]] = self.register[args[0]]
+        return pc
+
+    def doLoadi(self, args, pc):
+        register = self.register
+        self.checkData(register[args[1]], "Invalid load target")
+        register[args[0]] = self.memory[register[args[1]]]
+        return pc
+
+    def doStorei(self, args, pc):
+        register = self.register
+        self.checkData(register[args[1]], "Invalid store target")
+        self.memory[register[args[1]]] = register[args[0]]
+        return pc
+
+    def doAddn(self, args, pc):
+        register = self.register
+        register[args[0]] += args[1]
+        self.checkOverflow(register[args[0]])
+        return pc
+
+    def doAdd(self, args, pc):      # also handles mov and nop
+        register = self.register
+        register[args[0]] = register[args[1]] + register[args[2]]
+        self.checkOverflow(register[args[0]])
+        return pc
+
+    def doSub(self, args, pc):      # also handles neg
+        register = self.register
+        register[args[0]] = register[args[1]] - register[args[2]]
+        self.checkOverflow(register[args[0]])
+        return pc
+
+    def doMul(self, args, pc):
+        register = self.register
+        register[args[0]] = register[args[1]] * register[args[2]]
+        self.checkOverflow(register[args[0]])
+        return pc
+
+    def doDiv(self, args, pc):
+        register = self.register
+        try:
+            register[args[0]] = register[args[1]] // register[args[2]]
+        except ZeroDivisionError :
+            raise SimulationError("Division by Zero Error at pc "
+              + str(self.lpc) + ".")
+        return pc
+
+    def doMod(self, args, pc):
+        register = self.register
+        try:
+            register[args[0]] = register[args[1]] % register[args[2]]
+        except ZeroDivisionError :
+            raise SimulationError("Division by Zero Error at pc "
+              + str(self.lpc) + ".")
+        return pc
+
+    def doCall(self, args, pc):     # also handles jump
+        self.register[args[0]] = pc
+        return self.checkJump(args[1], "Invalid jump/call target")
+
+    def doJeqz(self, args, pc):
+        if self.register[args[0]] == 0:
+            pc = args[1]
+        return self.checkJump(pc)
+
+    def doJltz(self, args, pc):
+        if self.register[args[0]] < 0:
+            pc = args[1]
+        return self.checkJump(pc)
+
+    def doJgtz(self, args, pc):
+        if self.register[args[0]] > 0:
+            pc = args[1]
+        return self.checkJump(pc)
+
+    def doJnez(self, args, pc):
+        if self.register[args[0]] != 0:
+            pc = args[1]
+        return self.checkJump(pc)
+
+    def doInvalid(self, args, pc):
+        raise SimulationError("Invalid operation code at pc "
+          + str(self.lpc))
+
+#
+# The jump table: maps each mnemonic opcode to its handler.
+#
+handlers = {"halt": HmmmMachine.doHalt,
+        "read": HmmmMachine.doRead,
+        "write": HmmmMachine.doWrite,
+        "jumpi": HmmmMachine.doJumpi,
+        "loadn": HmmmMachine.doLoadn,
+        "load": HmmmMachine.doLoad,
+        "store": HmmmMachine.doStore,
+        "loadi": HmmmMachine.doLoadi,
+        "storei": HmmmMachine.doStorei,
+        "addn": HmmmMachine.doAddn,
+        "add": HmmmMachine.doAdd,
+        "mov": HmmmMachine.doAdd,
+        "nop": HmmmMachine.doAdd,
+        "sub": HmmmMachine.doSub,
+        "neg": HmmmMachine.doSub,
+        "mul": HmmmMachine.doMul,
+        "div": HmmmMachine.doDiv,
+        "mod": HmmmMachine.doMod,
+        "jump": HmmmMachine.doCall,
+        "call": HmmmMachine.doCall,
+        "jeqz": HmmmMachine.doJeqz,
+        "jgtz": HmmmMachine.doJgtz,
+        "jltz": HmmmMachine.doJltz,
+        "jnez": HmmmMachine.doJnez}
+
+def decode(line):
+    """Decode a binary line once, before the program runs, returning a
+(handler, arguments) pair.  Pseudo-operations are rewritten in terms of
+the instructions they stand for, so each handler sees a uniform argument
+list."""
+    (opcode, args) = decodeWord(wordOf(line))
+    if opcode == "nop":
+        args = [0, 0, 0]
+    elif opcode == "mov":
+        args = args + [0]
+    elif opcode == "neg":
+        args = [args[0], 0, args[1]]
+    elif opcode == "jump":
+        args = [0] + args
+    return (handlers.get(opcode, HmmmMachine.doInvalid), tuple(args))
 
 def simulationError(message):
     """Issue an error message and halt program execution."""
@@ -176,39 +490,17 @@ def simulationError(message):
     print("Halting program execution.")
     sys.exit()
 
-def run() :
-    global pc,  memory, loop_check, lpc, codesize
-    while pc != -1:         # fetch/execute cycle
-        if pc not in list(range(codesize)) :
-            simulationError("Memory Out of Bounds Error.\n"
-              + "Program attempted to execute memory location " + str(pc))
-        ir = memory[pc]         # Fetch and store into instruction register
-        lpc = pc
-        pc = pc+1           # increment pc
-        try :
-            execute(ir)         # execute instruction
-        except EOFError :
-            print("\n\nEnd of input, halting program execution...\n")
-            sys.exit()
-
-def checkOverflow(register, ir, lpc):
-    
-    if not valid_integer(register):
-        parts = ir.split()
-        (translation, opcode, args) = disassemble(memory[lpc])
-        print("\n  Program Counter:", lpc)
-        print("  Instruction:", opcode, "  Arguments:", ", ".join(parts[1:]))
-        print("  Translation:", translation, end=' ')
-        simulationError("Integer Overflow Error: Result was larger than 16 bits.\n")
-
-def execute(ir) :
-    global memory, register, pc, debug, ask, lpc
+def debugStep(machine) :
+    """Show the debug mode menu before the machine executes an instruction."""
+    global debug, ask
 
-    #print('ir = ', ir)
-    if ir == "": # or valid_integer(ir):  # funny error! DCH
-        simulationError("Bad instruction at memory location " + lpc)
+    if not debug :      # the 'run' command leaves debugging mode
+        return
 
-    parts = ir.split()      # parse instruction
+    memory = machine.memory
+    register = machine.register
+    codesize = machine.codesize
+    pc = machine.pc
 
     # This is the debug mode menu
     if debug :
@@ -262,178 +554,35 @@ def execute(ir) :
                     loop = 0
         # end of "if ask"
 
-    (translation, opcode, args) = disassemble(memory[lpc])
-
     if debug :  # this is necessary because of the 'run' command
-        print("\n  Program Counter:", lpc)
-        print("  Instruction:", opcode, "  Arguments:", ", ".join(parts[1:]))
+        (translation, opcode, args) = disassemble(memory[pc])
+        print("\n  Program Counter:", pc)
+        print("  Instruction:", opcode, "  Arguments:",
+          ", ".join(memory[pc].split()[1:]))
         print("  Translation:", translation)
         if next :
-            print("  Next Target:", pc)
-            print("  Next Instruction:", disassemble(memory[pc])[0], "\n")
-
-    # Register 0 is always forced to zero
-    register[0] = 0
-
-    if opcode == "halt":  
-        pc = -1                 # This terminates the run loop
-        if debug :
+            print("  Next Target:", pc+1)
+            print("  Next Instruction:", disassemble(memory[pc+1])[0], "\n")
+        if opcode == "halt" :
             print("halt\n")
 
-    elif opcode == "read":
-        sys.stdin.flush()
-        sys.stdout.flush()
-        sys.stderr.flush()
-        input2 = input()            # removed for socrates by AB
-        while input2 == "" \
-          or  (not (input2.isdigit() \
-            or (input2[0] == '-' and input2[1:].isdigit()))) \
-          or not valid_integer(int(input2)):
-            print("\n\nIllegal input: number must be in [-32768,32767]")
-            input2 = input("Enter number (q to quit): ")
-            if input2 == "q" :
-                sys.exit()
-        register[args[0]] = int(input2) 
-
-    elif opcode == "write":
-        print(register[args[0]])
-
-    elif opcode == "jumpi":
-        pc = register[args[0]]
-        if pc not in list(range(codesize)):
-            simulationError("Invalid jump target at pc " + str(lpc) \
-              + ": " + str(pc))
-
-    elif opcode == "loadn":
-        register[args[0]] = args[1]
-
-    elif opcode == "load":
-        if args[1] not in list(range(codesize, 256)) :
-            simulationError("Invalid load target at pc " + str(lpc) \
-              + ": " + str(args[1]))
-        register[args[0]] = memory[args[1]]
-
-    elif opcode == "store":
-        if args[1] not in list(range(codesize, 256)) :
-            simulationError("Invalid store target at pc " + str(lpc) \
-              + ": " + str(args[1]))
-        memory[args[1]] = register[args[0]]
-
-    elif opcode == "loadi":
-        if register[args[1]] not in list(range(codesize, 256)) :
-            simulationError("Invalid load target at pc " + str(lpc) \
-              + ": " + str(register[args[1]]))
-        register[args[0]] = memory[register[args[1]]]
-
-    elif opcode == "storei":
-        if register[args[1]] not in list(range(codesize, 256)) :
-            simulationError("Invalid store target at pc " + str(lpc) \
-              + ": " + str(register[args[1]]))
-        memory[register[args[1]]] = register[args[0]]
-
-    elif opcode == "addn":
-        register[args[0]] += args[1]
-        checkOverflow(register[args[0]], ir, lpc)
-
-    elif opcode == "add"  or  opcode == "mov"  or  opcode == "nop":
-        if opcode == "nop":
-            args = [0, 0, 0]
-        elif opcode == "mov":
-            args += [0]
-        register[args[0]] = register[args[1]] + register[args[2]]
-        checkOverflow(register[args[0]], ir, lpc)
-
-    elif opcode == "sub"  or  opcode == "neg":
-        if opcode == "neg":
-            args = [args[0], 0, args[1]]
-        register[args[0]] = register[args[1]] - register[args[2]]
-        checkOverflow(register[args[0]], ir, lpc)
-
-    elif opcode == "mul":
-        register[args[0]] = register[args[1]] * register[args[2]]
-        checkOverflow(register[args[0]], ir, lpc)
-
-    elif opcode == "div":
-        try:
-            register[args[0]] = register[args[1]] // register[args[2]]
-        except ZeroDivisionError :
-            simulationError("Division by Zero Error at pc " + str(lpc) + ".")
-
-    elif opcode == "mod":
-        try:
-            register[args[0]] = register[args[1]] % register[args[2]]
-        except ZeroDivisionError :
-            simulationError("Division by Zero Error at pc " + str(lpc) + ".")
-
-    elif opcode == "jump"  or  opcode == "call":
-        if opcode == "jump":
-            args = [0] + args
-        register[args[0]] = pc
-        pc = args[1]
-        if pc not in list(range(codesize)):
-            simulationError("Invalid jump/call target at pc " + str(lpc) \
-              + ": " + str(pc))
-
-    elif opcode == "jeqz":
-        if register[args[0]] == 0:
-            pc = args[1]
-        if pc not in list(range(codesize)):
-            simulationError("Invalid jump target at pc " + str(lpc) \
-              + ": " + str(pc))
-
-    elif opcode == "jltz":
-        if register[args[0]] < 0:
-            pc = args[1]
-        if pc not in list(range(codesize)):
-            simulationError("Invalid jump target at pc " + str(lpc) \
-              + ": " + str(pc))
-
-    elif opcode == "jgtz":
-        if register[args[0]] > 0:
-            pc = args[1]
-        if pc not in list(range(codesize)):
-            simulationError("Invalid jump target at pc " + str(lpc) \
-              + ": " + str(pc))
-
-    elif opcode == "jnez":
-        if register[args[0]] != 0:
-            pc = args[1]
-        if pc not in list(range(codesize)):
-            simulationError("Invalid jump target at pc " + str(lpc) \
-              + ": " + str(pc))
-
-    else:
-        simulationError("Invalid operation code at pc " + str(pc))
-
-    # Re-force register 0 to zero so register dumps will be correct.
-    register[0] = 0
-
 def readfile(filename) :
-    global memory, codesize
+    """Read the lines of machine code from the named file."""
     try:
         f = open(filename,"r")    # file with machine code #DCH
     except:
         print("Cannot open file: ", filename)
         sys.exit()
-    address = 0
-    codesize = 0
-    while 1 :
-        line = f.readline()
-        for c in line:
-            if c not in "01 \n":
-                print("\nERROR: Not a valid binary file.\n")
-                sys.exit()
-        if line == "": break
-        memory[address] = line
-        address = address + 1
-        codesize = codesize + 1
-    if codesize == 0:
-        print("\nERROR: Empty file.\n")
-        sys.exit()
+    program = f.readlines()
     f.close()
+    return program
+
+def main ( argList=None, step_limit=None, timeout=None ) :
+    global debug, ask, register_display, memory_display, visualize
 
-def main ( argList=None ) :
-    global debug, register_display, memory_display, visualize
+    # the debugging state is left over from any earlier run
+    debug, ask = 0, 1
+    register_display, memory_display = 0, 0
 
     # argument handling:
     fname = 0
@@ -472,8 +621,13 @@ def main ( argList=None ) :
     if filename == "" :
         filename = input("Enter binary input file name: ")
 
-    readfile(filename)
-    # to read from stdin instead we would use:  program = sys.stdin.readlines()
+    machine = HmmmMachine()
+    try :
+        machine.load(readfile(filename))
+    except LoadError as e :
+        print("\nERROR: " + str(e) + "\n")
+        sys.exit()
+    # to read from stdin instead we would use:  sys.stdin.readlines()
     if debug == 0:
         yn = input("Enter debugging mode? ")
         if re.findall(r'(^y[es]*)|(^indeed)|^t$|(^true)|(^affirmative)', yn) :
@@ -490,10 +644,10 @@ def main ( argList=None ) :
         visualize.reg_setup()
 
     try :
-        run()
-    except EOFError :
-        print("\n\nEnd of input, halting program execution...\n")
-        sys.exit()
+        machine.run(sys.stdin, max_steps=step_limit, timeout=timeout,
+                    stdout=sys.stdout, debugger=debugStep if debug else None)
+    except SimulationError as e :
+        simulationError(str(e))
 
 # When this module is executed from the command line, as in "python filename.py"
 # __name__ will be __main__, so main () will be executed.
@@ -0,0 +1,116 @@
+"""A record of the submissions that a batch has finished grading.
+
+A journal is a file to which one line (a JSON object) is appended whenever
+a submission directory has been graded, giving the assignment, the
+directory, the exit code of its grading, how long grading took, and the
+hash of the grade file it produced. Lines are never changed or removed, so
+the journal survives a batch that is interrupted or crashes, and a later
+batch can skip the submissions that an earlier one finished. If the same
+directory was graded more than once, its last line is the one that counts.
+"""
+
+import os
+import json
+import time
+import threading
+
+import util
+
+# exit codes of submissions that do not need to be graded again
+FINISHED_CODES = [0, util.EXIT_WITH_MISSING, util.ERR_GRADE_FILE_EXISTS]
+
+
+class Journal:
+    def __init__(self, path, assignment):
+        """Open the journal at 'path' for grading the given assignment
+        (e.g., "ps4a"). The file is created when the first entry is
+        recorded.
+        """
+        self.path = path
+        self.assignment = assignment
+
+        # grading may finish in more than one thread at once
+        self._lock = threading.Lock()
+
+    def finished(self):
+        """Return a dict mapping the absolute path of each submission
+        directory for this assignment that was graded successfully, and
+        whose grade file still exists, to its last journal entry.
+        """
+        last = {}
+        for entry in self._entries():
+            if entry.get('assignment') == self.assignment:
+                last[entry.get('directory')] = entry
+
+        done = {}
+        for directory, entry in last.items():
+            if entry.get('code') not in FINISHED_CODES:
+                continue
+
+            # a submission whose grade file was deleted is graded again,
+            # but one that a grader has edited since is not
+            grade_path = entry.get('grade_file')
+            if grade_path is not None and not os.path.isfile(grade_path):
+                continue
+
+            done[directory] = entry
+
+        return done
+
+    def record(self, subdir, code, seconds, grade_path=None):
+        """Append an entry for a submission directory that has been graded,
+        given the exit code of its grading, the number of seconds it took,
+        and the path to the grade file it should have produced.
+        """
+        import cache
+
+        grade_hash = None
+        if grade_path is not None:
+            grade_path = os.path.abspath(grade_path)
+
+            try:
+                grade_hash = cache.file_hash(grade_path)
+            except OSError:
+                pass
+
+        entry = {'assignment': self.assignment,
+                 'directory': os.path.abspath(subdir),
+                 'code': code,
+                 'seconds': round(seconds, 3),
+                 'grade_file': grade_path,
+                 'grade_hash': grade_hash,
+                 'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+        line = json.dumps(entry) + '\n'
+
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            util.makedirs(directory)
+
+            with open(self.path, 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _entries(self):
+        """Return the entries in the journal, in the order in which they
+        were written. Lines that cannot be read (e.g., one that was being
+        written when a batch crashed) are skipped.
+        """
+        entries = []
+
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+
+                    if type(entry) is dict:
+                        entries.append(entry)
+
+        except FileNotFoundError:
+            pass
+
+        return entries
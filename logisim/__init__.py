@@ -1,24 +1,37 @@
 from logisim.circuit import Circuit
 
+# changes whenever the Circuit objects built from a .circ file change, so
+# that circuits cached by an older version are not used
+VERSION = "1"
+
 
 class LogisimFile:
-    def __init__(self, path):
-        import xml.etree.ElementTree as ET
+    def __init__(self, path, circuit_names=None):
+        """Build the circuits in a Logisim .circ file. If 'circuit_names' is
+        given, only the circuits with those names (and the circuits they
+        use as subcircuits) are built; the others are never constructed.
+        """
         from logisim.parser import from_xml
         from logisim.errors import InvalidWiringError
 
-        tree = ET.parse(path)
-        root = tree.getroot()
+        root = _parse_circuits(path)
+        elements = {c.attrib['name']: c for c in root}
 
-        circuits = [c for c in root.getchildren() if c.tag == 'circuit']
+        if circuit_names is None:
+            circuit_names = list(elements)
 
         objs = []
         broken = []
-        for c in circuits:
-            name = c.attrib['name']
+
+        # circuits built so far, shared so that subcircuits are built once
+        built = dict()
+
+        for name in circuit_names:
+            if name not in elements:
+                continue
 
             try:
-                obj = from_xml(root, c)
+                obj = from_xml(root, elements[name], built)
                 objs.append(obj)
 
             except InvalidWiringError:
@@ -34,8 +47,39 @@ class LogisimFile:
             return None
 
 
-def load(path):
+def load(path, circuit_names=None):
     """Given a path to a Logisim .circ file, return a LogisimFile object
-    containing the circuits saved in the .circ file.
+    containing the circuits saved in the .circ file (or only the circuits
+    named in 'circuit_names', if it is given).
+    """
+    return LogisimFile(path, circuit_names)
+
+
+def _parse_circuits(path):
+    """Parse a Logisim .circ file incrementally and return the root of its
+    XML tree, keeping only the 'circuit' elements. Everything else (e.g.,
+    libraries, options, and custom appearances of circuits) is discarded
+    as soon as it has been read, so it is never held in memory.
     """
-    return LogisimFile(path)
+    import xml.etree.ElementTree as ET
+
+    # the elements that have been started but not yet ended
+    open_elements = []
+
+    for event, el in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            open_elements.append(el)
+            continue
+
+        open_elements.pop()
+        depth = len(open_elements)
+
+        if depth == 1 and el.tag != 'circuit':
+            # a child of the root that is not a circuit
+            open_elements[0].remove(el)
+
+        elif depth == 2 and el.tag == 'appear':
+            open_elements[1].remove(el)
+
+    # the last element to end is the root
+    return el
@@ -1,5 +1,6 @@
 from logisim.debug import narrate
-from logisim.errors import NoSuchPinLabelError, DuplicatePinLabelError
+from logisim.errors import NoSuchPinLabelError, DuplicatePinLabelError, \
+                           NoValueGivenError
 from logisim.pins import InputPin, OutputPin
 
 
@@ -20,6 +21,7 @@ class Circuit:
     def input_pins(self, new_pins):
         _check_pins(new_pins, InputPin)
         self._input_pins = new_pins
+        self._netlist = None
 
     @property
     def output_pins(self):
@@ -29,6 +31,71 @@ class Circuit:
     def output_pins(self, new_pins):
         _check_pins(new_pins, OutputPin)
         self._output_pins = new_pins
+        self._netlist = None
+
+    @property
+    def netlist(self):
+        """The Netlist used to evaluate this circuit, which is compiled (with
+        its subcircuits flattened) the first time it is needed. Raises
+        InvalidWiringError if the circuit has a cycle.
+        """
+        if self._netlist is None:
+            from logisim.netlist import Netlist
+            self._netlist = Netlist(self, flatten=True)
+
+        return self._netlist
+
+    def __getstate__(self):
+        """Circuits are pickled with a flat list of their components, rather
+        than as components that refer to each other, which pickle would
+        follow recursively (exceeding the recursion limit for deep
+        circuits). Only components that the pins are connected to (directly
+        or not) are kept, and the netlist is compiled again when needed.
+        """
+        components = self.input_pins + self.output_pins
+        index = {id(comp): i for i, comp in enumerate(components)}
+
+        i = 0
+        while i < len(components):
+            for comp, _ in components[i].input_from.values():
+                if id(comp) not in index:
+                    index[id(comp)] = len(components)
+                    components.append(comp)
+
+            i += 1
+
+        comp_states = []
+        for comp in components:
+            attrs = {k: v for k, v in comp.__dict__.items()
+                     if k != '_input_from'}
+            wiring = [(loc, index[id(other)], other_loc)
+                      for loc, (other, other_loc) in comp.input_from.items()]
+
+            comp_states.append((type(comp), attrs, wiring))
+
+        return {'name': self.name,
+                'num_inputs': len(self.input_pins),
+                'num_outputs': len(self.output_pins),
+                'components': comp_states}
+
+    def __setstate__(self, state):
+        components = []
+        for cls, attrs, _ in state['components']:
+            comp = cls.__new__(cls)
+            comp.__dict__.update(attrs)
+            comp.input_from = {}
+
+            components.append(comp)
+
+        for comp, (_, _, wiring) in zip(components, state['components']):
+            for loc, i, other_loc in wiring:
+                comp.input_from[loc] = (components[i], other_loc)
+
+        n, m = state['num_inputs'], state['num_outputs']
+
+        self.name = state['name']
+        self.input_pins = components[:n]
+        self.output_pins = components[n:n + m]
 
     def get_input_pin(self, label):
         pins = []
@@ -79,7 +146,49 @@ class Circuit:
 
                 pin.value = value
 
-        return {pin: pin.eval() for pin in self.output_pins}
+        input_values = [getattr(pin, 'value', None)
+                        for pin in self.input_pins]
+        output_values = self.netlist.eval(input_values)
+
+        for value in output_values:
+            if value is None:
+                raise NoValueGivenError("input pin was not given a value")
+
+            if type(value) is not bool:
+                raise value
+
+        return dict(zip(self.output_pins, output_values))
+
+    def eval_bits(self, input_dict, width):
+        """Evaluate the circuit for 'width' input vectors at once. Given a
+        dictionary mapping input pin labels (or InputPin objects) to
+        integers whose bits are the pin's values in each vector, return a
+        dictionary that maps output pins to (ones, known) tuples: the bits
+        of the vectors for which the pin is on, and those for which it
+        has a value at all. Input pins that are not in the dictionary
+        have no value, and their 'value' attributes are not changed.
+        """
+        full = (1 << width) - 1
+        masks = {}
+
+        for label_or_pin, ones in input_dict.items():
+            if type(label_or_pin) is str:
+                pin = self.get_input_pin(label_or_pin)
+
+            else:
+                pin = label_or_pin
+
+                if pin not in self.input_pins:
+                    raise ValueError("specified an InputPin that is not " + \
+                                     "in this circuit")
+
+            masks[pin] = (ones & full, full)
+
+        input_values = [masks.get(pin, (0, 0)) for pin in self.input_pins]
+        output_values = self.netlist.eval_bits(input_values, width)
+
+        return {pin: (ones, known) for pin, (ones, known, _)
+                in zip(self.output_pins, output_values)}
 
 
 def _check_pins(pins, type_):
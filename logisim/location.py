@@ -49,10 +49,14 @@ class Location:
                 self.x, self.y = x, y
 
     def __eq__(self, other):
+        if type(other) is not Location:
+            return NotImplemented
+
         return self.x == other.x and self.y == other.y
 
     def __hash__(self):
-        return self.x ^ self.y
+        # x ^ y would give every point on a diagonal the same hash
+        return hash((self.x, self.y))
 
     def __str__(self):
         return "Location" + repr(self)
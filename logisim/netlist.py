@@ -0,0 +1,516 @@
+"""Compiling a Circuit into a flat list of operations for fast evaluation.
+
+A Netlist holds one operation for each component output that the
+circuit's output pins depend on, sorted so that every operation comes
+after the operations that produce its inputs. Evaluating a circuit is then
+a single pass over the list, and each gate is evaluated once no matter how
+many other gates use its output.
+
+During evaluation, each operation produces True or False, None if it has
+no value (e.g., it depends only on an input pin that was not given a
+value), or an instance of LogisimError if evaluating it should raise that
+error. These mirror the return values and exceptions of the eval()
+methods of the components.
+
+A netlist either evaluates the circuit inside each subcircuit with that
+circuit's own netlist, or, if it is "flattened", has its own copy of the
+operations of each subcircuit, so evaluation never leaves the one list.
+
+A netlist can also evaluate many input vectors at once with eval_bits().
+Each value is then a (ones, known, bad) tuple of integers used as bit
+masks, with one bit for each input vector: 'ones' has the bits of the
+vectors for which the value is True, 'known' those for which it is True
+or False, and 'bad' those for which evaluating it raises an error.
+"""
+
+from logisim.errors import InvalidWiringError, NoInputsError, \
+                           TooManyInputsError
+from logisim.gates import ANDGate, ORGate, NORGate, NOTGate
+from logisim.pins import InputPin, OutputPin
+from logisim.constant import Constant
+from logisim.subcircuit import Subcircuit, _default_subcircuit_locations
+
+# operation codes
+OP_INPUT = 0                # argument: index of the input pin
+OP_CONSTANT = 1             # argument: the constant's value
+OP_AND = 2                  # argument: (indices of the inputs, description)
+OP_OR = 3                   # argument: (indices of the inputs, description)
+OP_NOR = 4                  # argument: (indices of the inputs, description)
+OP_NOT = 5                  # argument: index of the input
+OP_COPY = 6                 # argument: index of the input (output pins)
+OP_ERROR = 7                # argument: the error to produce
+OP_SUBCIRCUIT = 8           # argument: (Netlist, indices of the inputs)
+OP_SELECT = 9               # argument: (index of subcircuit, output number)
+OP_GUARD = 10               # argument: (indices of the inputs and outputs)
+OP_GUARDED = 11             # argument: (index of guard, index of the output)
+
+# the keys of the operations that evaluate the circuit inside a subcircuit
+# and, when flattening, check whether it failed
+_INNER = 'inner'
+_GUARD = 'guard'
+
+
+class Netlist:
+    def __init__(self, circuit, flatten=False):
+        """Compile a Circuit into a netlist. If the output of a component
+        that an output pin depends on itself depends on that output (i.e.,
+        the circuit has a cycle), InvalidWiringError is raised. If
+        'flatten' is True, the operations of subcircuits are inlined.
+        """
+        self.circuit = circuit
+        self.flatten = flatten
+
+        # the operations, as (operation code, argument) tuples
+        self.ops = []
+
+        # the index in 'ops' of the operation for each output pin
+        self.outputs = []
+
+        # maps keys of component outputs to indices in 'ops'; a key is a
+        # (component, output location, subcircuits) tuple, where the last
+        # item holds the subcircuits (outermost first) whose operations
+        # were inlined to reach the component
+        self._index = {}
+
+        # maps subcircuits to the pins at their locations, and back
+        self._sub_pins = {}
+
+        for pin in circuit.output_pins:
+            self.outputs.append(self._compile((pin, None, ())))
+
+        del self._index, self._sub_pins
+
+
+    def eval(self, input_values):
+        """Given a list of values for the circuit's input pins (in the
+        order of the circuit's 'input_pins' list), return a list of values
+        for its output pins (in the order of 'output_pins'). A value is
+        True or False, None if there is no value, or an instance of
+        LogisimError if evaluating that output pin raises an error.
+        """
+        values = []
+        append = values.append
+
+        for op, arg in self.ops:
+            if op == OP_AND or op == OP_OR or op == OP_NOR:
+                inputs, desc = arg
+                append(_eval_gate(op, [values[i] for i in inputs], desc))
+
+            elif op == OP_INPUT:
+                append(input_values[arg])
+
+            elif op == OP_NOT:
+                v = values[arg]
+                append(not v if type(v) is bool else v)
+
+            elif op == OP_COPY:
+                append(values[arg])
+
+            elif op == OP_CONSTANT or op == OP_ERROR:
+                append(arg)
+
+            elif op == OP_GUARDED:
+                guard_index, i = arg
+                v = values[guard_index]
+                append(values[i] if v is True else v)
+
+            elif op == OP_GUARD:
+                inputs, outputs = arg
+                append(_eval_guard([values[i] for i in inputs],
+                                   [values[i] for i in outputs]))
+
+            elif op == OP_SUBCIRCUIT:
+                netlist, inputs = arg
+                append(_eval_subcircuit(netlist,
+                                        [values[i] if i is not None else None
+                                         for i in inputs]))
+
+            else: # op == OP_SELECT
+                sub_index, output_num = arg
+                v = values[sub_index]
+                append(v[output_num] if type(v) is list else v)
+
+        return [values[i] for i in self.outputs]
+
+
+    def eval_bits(self, input_values, width):
+        """Evaluate 'width' input vectors at once. Given a list with a
+        (ones, known) tuple of bit masks for each of the circuit's input
+        pins (see the module's docstring), return a list with a
+        (ones, known, bad) tuple for each output pin. Vectors in which an
+        output pin has no value or raises an error are not 'known'.
+        """
+        full = (1 << width) - 1
+        values = []
+        append = values.append
+
+        for op, arg in self.ops:
+            if op == OP_AND or op == OP_OR or op == OP_NOR:
+                inputs, _ = arg
+                append(_eval_gate_bits(op, [values[i] for i in inputs],
+                                       full))
+
+            elif op == OP_INPUT:
+                ones, known = input_values[arg]
+                append((ones & known, known, 0))
+
+            elif op == OP_NOT:
+                ones, known, bad = values[arg]
+                append(((ones ^ full) & known, known, bad))
+
+            elif op == OP_COPY:
+                append(values[arg])
+
+            elif op == OP_CONSTANT:
+                if arg is None:
+                    append((0, 0, 0))
+                else:
+                    append((full if arg else 0, full, 0))
+
+            elif op == OP_GUARDED:
+                guard_index, i = arg
+                ok, _, bad = values[guard_index]
+                ones, known, _ = values[i]
+                append((ones & ok, known & ok, bad))
+
+            elif op == OP_GUARD:
+                inputs, outputs = arg
+                append(_eval_guard_bits([values[i] for i in inputs],
+                                        [values[i] for i in outputs], full))
+
+            elif op == OP_ERROR:
+                append((0, 0, full))
+
+            elif op == OP_SUBCIRCUIT:
+                netlist, inputs = arg
+                vals = [values[i] if i is not None else (0, 0, 0)
+                        for i in inputs]
+                append(_eval_subcircuit_bits(netlist, vals, width))
+
+            else: # op == OP_SELECT
+                sub_index, output_num = arg
+                outputs, bad = values[sub_index]
+                ones, known, _ = outputs[output_num]
+                append((ones, known, bad))
+
+        return [values[i] for i in self.outputs]
+
+
+    def _compile(self, key):
+        """Add operations for the component output identified by 'key' and
+        every output it depends on. Return the index of the operation for
+        'key'.
+        """
+        if key in self._index:
+            return self._index[key]
+
+        # an iterative depth-first search, so that deep circuits do not
+        # reach Python's recursion limit; 'visiting' holds the keys on the
+        # current path, which would form a cycle if seen again
+        visiting = set()
+        stack = [(key, None)]
+
+        while stack:
+            key, deps = stack.pop()
+
+            if deps is None:
+                if key in self._index:
+                    continue
+
+                if key in visiting:
+                    raise InvalidWiringError(_cycle_description(self.circuit,
+                                                                key[0]))
+
+                visiting.add(key)
+                deps = self._dependencies(key)
+
+                stack.append((key, deps))
+                for dep in reversed(deps):
+                    if dep not in self._index:
+                        stack.append((dep, None))
+
+            else:
+                visiting.discard(key)
+
+                if key not in self._index:
+                    for dep in deps:
+                        if dep not in self._index:
+                            # a dependency is still being visited
+                            raise InvalidWiringError(
+                                _cycle_description(self.circuit, key[0]))
+
+                    self._index[key] = len(self.ops)
+                    self.ops.append(self._operation(key, deps))
+
+        return self._index[key]
+
+
+    def _dependencies(self, key):
+        """Return the keys of the component outputs that the component
+        output identified by 'key' uses directly.
+        """
+        comp, loc, path = key
+        cls = type(comp)
+
+        def sources(comp, path):
+            return [(c, l, path) for c, l in comp.input_from.values()]
+
+        if cls is Subcircuit:
+            if not self.flatten:
+                if loc is _INNER:
+                    return sources(comp, path)
+                else:
+                    return [(comp, _INNER, path)]
+
+            # the subcircuit's outputs are guarded by a check that all of
+            # its inputs and the inner circuit's outputs have values
+            inner = path + (comp,)
+            outputs = [(pin, None, inner) for pin in comp.circuit.output_pins]
+
+            if loc is _GUARD:
+                return sources(comp, path) + outputs
+
+            pin_at, _ = self._pins(comp)
+            return [(comp, _GUARD, path), (pin_at[loc], None, inner)]
+
+        if cls is InputPin and path:
+            # an input pin of an inlined subcircuit uses whatever is
+            # connected to the subcircuit at that pin's location
+            sub = path[-1]
+            _, loc_of = self._pins(sub)
+            src = sub.input_from.get(loc_of[comp])
+
+            if src is None:
+                return []
+
+            return [(src[0], src[1], path[:-1])]
+
+        if cls is OutputPin:
+            return sources(comp, path)[:1]
+
+        return sources(comp, path)
+
+
+    def _pins(self, sub):
+        """Return a dictionary mapping locations on a subcircuit to its
+        pins, and one mapping the pins to their locations.
+        """
+        if sub not in self._sub_pins:
+            pin_at = _default_subcircuit_locations(sub)
+            loc_of = {pin: loc for loc, pin in pin_at.items()
+                      if pin is not None}
+
+            self._sub_pins[sub] = (pin_at, loc_of)
+
+        return self._sub_pins[sub]
+
+
+    def _operation(self, key, deps):
+        comp, loc, path = key
+        inputs = [self._index[dep] for dep in deps]
+        cls = type(comp)
+
+        if cls is InputPin:
+            if not path:
+                return (OP_INPUT, self.circuit.input_pins.index(comp))
+
+            if not inputs:
+                # nothing is connected to this pin of the subcircuit
+                return (OP_CONSTANT, None)
+
+            return (OP_COPY, inputs[0])
+
+        if cls is Constant:
+            return (OP_CONSTANT, comp.value)
+
+        if cls is OutputPin:
+            if len(comp.input_from) == 0:
+                return (OP_ERROR, NoInputsError(repr(comp)))
+
+            return (OP_COPY, inputs[0])
+
+        if cls is NOTGate:
+            if len(comp.input_from) == 0:
+                return (OP_ERROR, NoInputsError())
+
+            if len(comp.input_from) > 1:
+                return (OP_ERROR, TooManyInputsError())
+
+            return (OP_NOT, inputs[0])
+
+        if cls in [ANDGate, ORGate, NORGate]:
+            if len(comp.input_from) == 0:
+                return (OP_ERROR, NoInputsError())
+
+            op = {ANDGate: OP_AND, ORGate: OP_OR, NORGate: OP_NOR}[cls]
+            return (op, (inputs, repr(comp)))
+
+        if cls is Subcircuit:
+            if loc is _GUARD:
+                num_inputs = len(comp.input_from)
+                return (OP_GUARD, (inputs[:num_inputs], inputs[num_inputs:]))
+
+            if self.flatten:
+                return (OP_GUARDED, (inputs[0], inputs[1]))
+
+            if loc is _INNER:
+                inner = comp.circuit.netlist
+                inputs = self._subcircuit_inputs(comp, inputs)
+                return (OP_SUBCIRCUIT, (inner, inputs))
+
+            pin_at, _ = self._pins(comp)
+            output_num = comp.circuit.output_pins.index(pin_at[loc])
+            return (OP_SELECT, (inputs[0], output_num))
+
+        raise ValueError("cannot compile component: " + repr(comp))
+
+
+
+    def _subcircuit_inputs(self, comp, inputs):
+        """Given a Subcircuit and the indices of the operations connected
+        to its input pins (in the order of its 'input_from' dict), return a
+        list with an index (or None, if nothing is connected) for each
+        input pin of the underlying circuit.
+        """
+        pin_at, _ = self._pins(comp)
+        by_pin = dict()
+
+        for in_pin_loc, index in zip(comp.input_from, inputs):
+            by_pin[pin_at[in_pin_loc]] = index
+
+        return [by_pin.get(pin) for pin in comp.circuit.input_pins]
+
+
+def _eval_gate(op, vals, desc):
+    """Evaluate an AND, OR or NOR gate, given the values of its inputs, as
+    the gates' eval() methods do.
+    """
+    # inputs without a value are ignored, but errors are passed on
+    present = []
+    for v in vals:
+        if v is None:
+            continue
+
+        if type(v) is not bool:
+            return v
+
+        present.append(v)
+
+    if not present:
+        return NoInputsError(desc + " not given any valid inputs")
+
+    if op == OP_AND:
+        return all(present)
+    elif op == OP_OR:
+        return any(present)
+    else:
+        return not any(present)
+
+
+def _eval_guard(input_vals, output_vals):
+    """Return True if a flattened subcircuit succeeds, given the values of
+    its inputs and of its underlying circuit's outputs. Otherwise, return
+    the value that all of its outputs have instead, as _eval_subcircuit()
+    would.
+    """
+    for v in input_vals:
+        if v is not None and type(v) is not bool:
+            return v
+
+    for v in output_vals:
+        if type(v) is not bool:
+            return v
+
+    return True
+
+
+def _eval_subcircuit(netlist, vals):
+    """Evaluate the circuit inside a subcircuit, given the values of its
+    input pins. Like Circuit.eval(), this fails if any output pin of the
+    inner circuit fails; in that case, the failure is returned instead of
+    a list of output values.
+    """
+    for v in vals:
+        if v is not None and type(v) is not bool:
+            return v
+
+    outputs = netlist.eval(vals)
+
+    for v in outputs:
+        if type(v) is not bool:
+            return v
+
+    return outputs
+
+
+def _eval_gate_bits(op, vals, full):
+    """Evaluate an AND, OR or NOR gate for many input vectors at once,
+    like _eval_gate(). Each value is a (ones, known, bad) tuple.
+    """
+    bad = 0
+    any_known = 0
+    all_ones = full         # vectors with no known False input
+    any_one = 0             # vectors with a known True input
+
+    for ones, known, b in vals:
+        bad |= b
+        any_known |= known
+        all_ones &= ones | (known ^ full)
+        any_one |= ones
+
+    # an error from any input is passed on, and a gate without any input
+    # values raises NoInputsError
+    bad |= any_known ^ full
+    known = full ^ bad
+
+    if op == OP_AND:
+        ones = all_ones & known
+    elif op == OP_OR:
+        ones = any_one & known
+    else:
+        ones = (any_one ^ full) & known
+
+    return (ones, known, bad)
+
+
+def _eval_subcircuit_bits(netlist, vals, width):
+    """Evaluate the circuit inside a subcircuit for many input vectors at
+    once, like _eval_subcircuit(). Return a tuple of the list of the inner
+    circuit's output values and a bit mask of the vectors for which all of
+    the subcircuit's outputs raise an error. For each vector, the first
+    inner output without a value (or with an error) decides the value of
+    every output of the subcircuit.
+    """
+    outputs = netlist.eval_bits([(ones, known) for ones, known, _ in vals],
+                                width)
+
+    ok, _, bad = _eval_guard_bits(vals, outputs, (1 << width) - 1)
+
+    outputs = [(ones & ok, known & ok, 0) for ones, known, _ in outputs]
+
+    return (outputs, bad)
+
+
+def _eval_guard_bits(input_vals, output_vals, full):
+    """Like _eval_guard(), for many input vectors at once. Return a
+    (ok, ok, bad) tuple of bit masks: the vectors for which the subcircuit
+    succeeds, and those for which its outputs raise an error.
+    """
+    # an error from any input is passed on
+    bad = 0
+    for _, _, b in input_vals:
+        bad |= b
+
+    # the vectors for which every output so far had a value
+    ok = full ^ bad
+
+    for _, known, b in output_vals:
+        bad |= b & ok
+        ok &= known
+
+    return (ok, ok, bad)
+
+
+def _cycle_description(circuit, comp):
+    return "in circuit " + repr(circuit.name) + ", the output of " + \
+           repr(comp) + " depends on itself"
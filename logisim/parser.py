@@ -16,13 +16,43 @@ from logisim.location import Location
 IGNORED_COMPONENTS = ['Text']
 
 
-def from_xml(root, circuit_root):
+def from_xml(root, circuit_root, circuits=None):
+    """Given the root of a Logisim XML tree and the root of a circuit tree
+    in it, return a Circuit object for the circuit. 'circuits' is a
+    dictionary mapping the names of circuits already built from the same
+    XML tree to their Circuit objects. Subcircuits are looked up in it (and
+    added to it) so that each subcircuit's circuit is built only once, no
+    matter how many instances of it there are.
+    """
+    if circuits is None:
+        circuits = dict()
+
+    circuit_name = circuit_root.attrib['name']
+
+    if circuit_name in circuits:
+        if circuits[circuit_name] is None:
+            raise InvalidWiringError("circuit " + repr(circuit_name) + \
+                                     " contains itself")
+
+        return circuits[circuit_name]
+
+    # mark the circuit as being built, in case it contains itself
+    circuits[circuit_name] = None
+
+    try:
+        circuit = _build_circuit(root, circuit_root, circuits)
+    except:
+        del circuits[circuit_name]
+        raise
+
+    circuits[circuit_name] = circuit
+    return circuit
+
+
+def _build_circuit(root, circuit_root, circuits):
     circuit_name = circuit_root.attrib['name']
 
-    # the wire graph is a mapping from a Location to a list of Wire objects,
-    # where a key Location represents an "end" of one or more wires, and the
-    # wires with an end at that location are stored in the list
-    wire_graph = dict()
+    wires = []
 
     # components are all non-wire objects in the circuit
     components = []
@@ -39,7 +69,7 @@ def from_xml(root, circuit_root):
             frm = Location(child.attrib['from'])
             to = Location(child.attrib['to'])
 
-            _add_to_wire_graph(Wire(frm, to), wire_graph)
+            wires.append(Wire(frm, to))
 
         elif cls in [NOTGate, ANDGate, ORGate, NORGate, Constant, \
                      InputPin, OutputPin]:
@@ -61,7 +91,7 @@ def from_xml(root, circuit_root):
         elif cls is Subcircuit:
             name = child.attrib['name']
 
-            circuit_obj = from_xml(root, get_circuit(root, name))
+            circuit_obj = from_xml(root, get_circuit(root, name), circuits)
 
             # need to get attributes for this subcircuit
             # (e.g., facing direction)
@@ -80,6 +110,11 @@ def from_xml(root, circuit_root):
     # for each component, find the other component(s) connected to it
     # and add them to the component's 'input_from' dictionary
 
+    # these are computed once, so that finding connections takes time
+    # proportional to the size of the circuit
+    outputs = _index_outputs(components)
+    nets = _find_nets(wires)
+
     for comp in components:
         input_locs = comp.get_input_locations()
 
@@ -90,7 +125,7 @@ def from_xml(root, circuit_root):
         # for each input pin location
         for loc in input_locs:
             # there could be a component at this exact location
-            comp_here = _get_comp_at(loc, components)
+            comp_here = _get_comp_at(loc, outputs)
 
             if comp_here:
                 comp.input_from[loc] = (comp_here, loc)
@@ -98,12 +133,13 @@ def from_xml(root, circuit_root):
 
             # there's no component here, but there could be wires
             # from here to another component
-            if loc not in wire_graph:
+            if loc not in nets:
                 # there are no wires here
                 continue
 
-            # there is a wire here; find its source location(s)
-            source_locs = _follow_wire(loc, wire_graph)
+            # there is a wire here; its source location(s) are the other
+            # locations in the same net
+            source_locs = [l for l in nets[loc] if l != loc]
 
             # for each source location, find the component at that
             # location, if any
@@ -111,7 +147,7 @@ def from_xml(root, circuit_root):
             last_loc = None
             num = 0
             for src_loc in source_locs:
-                c = _get_comp_at(src_loc, components)
+                c = _get_comp_at(src_loc, outputs)
 
                 if c is not None:
                     last_loc = src_loc
@@ -135,7 +171,12 @@ def from_xml(root, circuit_root):
                 # all ends don't connect to any other components
                 pass
 
-    return Circuit(circuit_name, in_pins, out_pins)
+    circuit = Circuit(circuit_name, in_pins, out_pins)
+
+    # compiling the circuit now reports any cycles as wiring errors
+    circuit.netlist
+
+    return circuit
 
 
 def get_circuit(root, circuit_name):
@@ -233,7 +274,7 @@ def _get_attribute(el, attribute_name, fallback=None):
     hex_literal_pat = r'^0x\d+$'
 
     val = fallback
-    for a in el.getchildren():
+    for a in el:
         if a.attrib['name'] == attribute_name:
             val = a.attrib['val']
 
@@ -304,60 +345,67 @@ def _gate_type(el):
     raise ValueError("invalid or unknown gate type: " + name)
 
 
-def _follow_wire(end, wire_graph):
-    """Given a wire's ending Location and a "wire graph" obtained by parsing
-    all the wires in a circuit, "follow" the wire ending at 'end' to
-    one or more "sources": that is, the locations(s) where the other end of
-    the wire starts. (This function will find sources recursively, in
-    the case that a wire reaches an intersection with one or more other
-    wires.)
+def _find_nets(wires):
+    """Given a list of the wires in a circuit, group the wires' ends into
+    "nets": sets of locations that are connected to each other by wires
+    (possibly passing through intersections with other wires). Return a
+    dictionary mapping each wire end to a list of the locations in its net.
     """
-    sources = []
-    seen_wires = []
-    queue = []
-    queue.append(end)
-    while len(queue) > 0:
-        loc = queue.pop(0)
-
-        if loc != end:
-            sources.append(loc)
-
-        for wire in wire_graph[loc]:
-            if wire in seen_wires:
-                continue
+    # union-find over wire ends: each location points toward the
+    # representative location of its net
+    parent = {}
+
+    def find(loc):
+        root = loc
+        while parent[root] != root:
+            root = parent[root]
 
-            seen_wires.append(wire)
-            other_end = wire.other_end(loc)
-            queue.append(other_end)
+        # compress the path, so later finds are faster
+        while parent[loc] != root:
+            parent[loc], loc = root, parent[loc]
 
-    return sources
+        return root
 
+    for wire in wires:
+        for end in [wire.frm, wire.to]:
+            if end not in parent:
+                parent[end] = end
 
-def _add_to_wire_graph(wire, wire_graph):
-    to, frm = wire.to, wire.frm
+        a, b = find(wire.frm), find(wire.to)
+        if a != b:
+            parent[a] = b
 
-    if to not in wire_graph:
-        wire_graph[to] = [wire]
-    else:
-        wire_graph[to].append(wire)
+    members = {}
+    for loc in parent:
+        members.setdefault(find(loc), []).append(loc)
 
-    if frm not in wire_graph:
-        wire_graph[frm] = [wire]
-    else:
-        wire_graph[frm].append(wire)
+    return {loc: members[find(loc)] for loc in parent}
 
 
-def _get_comp_at(loc, components):
-    """Given a Location and a list of components, return the component
-    that has an output pin at that location, or None.
+def _index_outputs(components):
+    """Given a list of components, return a dictionary mapping each
+    Location to a list of the components that have an output pin there.
     """
-    comps_here = []
+    index = {}
     for comp in components:
-        if loc in comp.get_output_locations():
-            comps_here.append(comp)
+        for loc in comp.get_output_locations():
+            index.setdefault(loc, []).append(comp)
+
+    return index
+
+
+def _get_comp_at(loc, outputs):
+    """Given a Location and an index of output pins returned by
+    _index_outputs(), return the component that has an output pin at that
+    location, or None.
+    """
+    comps_here = outputs.get(loc)
+
+    if not comps_here:
+        return None
 
     if len(comps_here) > 1:
         raise ValueError("overlapping output pins at this location: " + \
                          str(loc))
 
-    return comps_here[0] if comps_here else None
+    return comps_here[0]
@@ -0,0 +1,255 @@
+"""Running code from a student's module in a separate worker process.
+
+A Sandbox keeps one worker process, which imports the student's module
+itself, so that the module's top-level code runs under the same limits as
+the tests. Functions are sent to the worker over a pipe and run there with
+the module as their first argument. The worker is subject to resource
+limits (CPU time and memory), and the import and every call have a
+wall-clock timeout. If a call times out or the worker dies, the worker is
+killed and a fresh one, which imports the module again, is forked for the
+next call, so one bad submission cannot hang or crash the grader.
+"""
+
+import multiprocessing
+import signal
+
+import util
+
+DEFAULT_TIMEOUT = 10            # seconds of wall-clock time per call
+
+
+class SandboxError(Exception):
+    """Raised when code sent to the worker raised an exception that the
+    function it was given did not handle.
+    """
+    pass
+
+
+class SandboxTimeout(SandboxError):
+    def __init__(self, seconds):
+        super().__init__("timed out after {} "
+                         "{}".format(seconds, util.plural('second', seconds)))
+
+
+class SandboxCrash(SandboxError):
+    def __init__(self, exit_code):
+        if exit_code == -signal.SIGXCPU:
+            msg = "exceeded the CPU time limit"
+        elif exit_code is not None and exit_code < 0:
+            msg = "killed by signal {}".format(-exit_code)
+        else:
+            msg = "crashed the Python interpreter " \
+                  "(exit code {})".format(exit_code)
+
+        super().__init__(msg)
+
+
+class Sandbox:
+    """A worker process that runs functions against a student's module.
+
+    'module_name' is the name of the module, which the worker imports (the
+    directory containing it must already be on sys.path). 'timeout' is the
+    default wall-clock limit (in seconds) for the import and each call,
+    'cpu_time' is the CPU time limit (in seconds) for the import and each
+    call, and 'memory' is how much more address space (in megabytes) the
+    worker may use than it had when it was forked. The worker starts as a
+    copy of the grader, so its limit is that much on top of the grader's
+    size at the time, and 'memory' is a budget for the student's code
+    alone. Limits that are None are not enforced.
+    """
+
+    def __init__(self, module_name, timeout=DEFAULT_TIMEOUT, cpu_time=None,
+                 memory=None):
+        self.module_name = module_name
+        self.timeout = timeout
+        self.cpu_time = cpu_time
+        self.memory = memory
+
+        self._process = None
+        self._conn = None
+
+
+    def start(self, timeout=None):
+        """Start the worker, if it is not running, and wait until it has
+        imported the module. The same exceptions as for call() are raised
+        if importing the module times out, crashes the worker, or raises
+        an exception.
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        if self._process is None:
+            self._start(timeout)
+
+
+    def call(self, func, *args, timeout=None):
+        """Run func(module, *args) in the worker and return its return
+        value, which must be picklable. If the call takes longer than
+        'timeout' seconds (or this sandbox's timeout, if 'timeout' is None),
+        the worker is killed and SandboxTimeout is raised. If the worker
+        dies, SandboxCrash is raised. If 'func' raises an exception,
+        SandboxError is raised with the worker's traceback.
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        if self._process is None:
+            self._start(timeout)
+
+        try:
+            self._conn.send((func, args))
+        except OSError:
+            exit_code = self._kill()
+            raise SandboxCrash(exit_code)
+
+        return self._receive(timeout)
+
+
+    def close(self):
+        """Stop the worker process, if one is running."""
+        if self._process is None:
+            return
+
+        self._conn.close()
+        self._process.join(1)
+        self._kill()
+
+
+    def _start(self, timeout):
+        """Fork a worker and wait up to 'timeout' seconds for it to import
+        the module.
+        """
+        context = multiprocessing.get_context('fork')
+
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=_serve,
+                                        args=(child_conn, self.module_name,
+                                              self.cpu_time, self.memory),
+                                        daemon=True)
+        self._process.start()
+        child_conn.close()
+
+        self._receive(timeout)
+
+
+    def _receive(self, timeout):
+        """Wait up to 'timeout' seconds for the worker's reply and return
+        the value it sent, raising SandboxTimeout, SandboxCrash, or
+        SandboxError if it does not send one successfully.
+        """
+        try:
+            if not self._conn.poll(timeout):
+                self._kill()
+                raise SandboxTimeout(timeout)
+
+            status, value = self._conn.recv()
+
+        except (EOFError, OSError):
+            exit_code = self._kill()
+            raise SandboxCrash(exit_code)
+
+        except KeyboardInterrupt:
+            self._kill()
+            raise
+
+        if status == 'error':
+            raise SandboxError(value)
+
+        return value
+
+
+    def _kill(self):
+        """Kill the worker process and return its exit code."""
+        if self._process is None:
+            return None
+
+        if self._process.is_alive():
+            self._process.kill()
+
+        self._process.join()
+        exit_code = self._process.exitcode
+
+        self._conn.close()
+        self._process, self._conn = None, None
+
+        return exit_code
+
+
+def _serve(conn, module_name, cpu_time, memory):
+    """The main loop of a worker process. The outcome of importing the
+    module is sent first, then the outcome of each call.
+    """
+    import importlib
+    import resource
+    import traceback
+
+    # the grader handles interrupts by killing this process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    if memory is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        soft = _address_space_size() + memory * 1024 * 1024
+
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+    if cpu_time is not None:
+        _limit_cpu_time(cpu_time)
+
+    try:
+        module = importlib.import_module(module_name)
+        conn.send(('ok', None))
+    except:
+        conn.send(('error', traceback.format_exc()))
+        return
+
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            break
+
+        if cpu_time is not None:
+            _limit_cpu_time(cpu_time)
+
+        try:
+            value = func(module, *args)
+            conn.send(('ok', value))
+        except:
+            conn.send(('error', traceback.format_exc()))
+
+
+def _address_space_size():
+    """Return the size (in bytes) of this process's address space, or 0 if
+    it cannot be found (it is read from /proc, which only Linux has).
+    """
+    import resource
+
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return 0
+
+    return pages * resource.getpagesize()
+
+
+def _limit_cpu_time(seconds):
+    """Allow this process to use 'seconds' more seconds of CPU time before
+    it receives SIGXCPU (which, by default, kills it).
+    """
+    import math
+    import resource
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = math.ceil(usage.ru_utime + usage.ru_stime)
+
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + seconds
+
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
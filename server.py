@@ -0,0 +1,242 @@
+"""A grading server that keeps criteria loaded between grading jobs.
+
+'socrates serve' listens on a Unix socket for grading jobs. Each
+connection carries exactly one job: the client sends a request (a JSON
+object) and closes its end for writing, and the server replies with a
+JSON object and closes the connection. The server prepares each job in
+its own process (e.g., by finding the already loaded criteria object), then
+forks a child that runs the job, so that state left behind by one student
+never reaches another, and so that the cost of starting socrates is paid
+once instead of for every submission. The output the child prints is
+returned to the client with the reply.
+"""
+
+import os
+import sys
+import json
+import socket
+
+import util
+
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024     # bytes
+REQUEST_TIMEOUT = 10                    # seconds to send a whole request
+
+
+class ServerError(Exception):
+    """Raised when a job cannot be sent to the server, or when the server
+    could not run it.
+    """
+    pass
+
+
+def serve(socket_path, prepare, run, jobs=1):
+    """Listen on the Unix socket at 'socket_path' and run grading jobs
+    until interrupted. For each request, 'prepare' is called in this
+    process with the request; it returns a value that is passed along
+    with the request to 'run' in a forked child, or raises ServerError if
+    the job cannot be run. 'run' returns a dict, which is sent back to the
+    client along with everything the child printed. At most 'jobs'
+    children run at once. A client that does not send its whole request
+    within REQUEST_TIMEOUT seconds is disconnected.
+    """
+    listener = _listen(socket_path)
+    running = set()
+
+    try:
+        while True:
+            # collect the children that have finished, waiting for one if
+            # no more can be started
+            while running:
+                options = 0 if len(running) >= jobs else os.WNOHANG
+                pid, _ = os.waitpid(-1, options)
+                if pid == 0:
+                    break
+
+                running.discard(pid)
+
+            conn, _ = listener.accept()
+
+            # requests are read one at a time, so a client that sends
+            # nothing (or only part of a request) must not hold up the rest
+            conn.settimeout(REQUEST_TIMEOUT)
+
+            try:
+                message = _receive(conn)
+                prepared = prepare(message)
+
+            except ServerError as e:
+                _reply(conn, {'error': str(e)})
+                continue
+
+            except OSError:
+                # the client went away, or was too slow, before sending
+                # its whole request
+                conn.close()
+                continue
+
+            # the job itself may take as long as it needs
+            conn.settimeout(None)
+
+            # anything still buffered would otherwise be printed by the
+            # child, too
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+            pid = os.fork()
+            if pid == 0:
+                listener.close()
+                _run_child(conn, run, message, prepared)
+
+            conn.close()
+            running.add(pid)
+
+    except KeyboardInterrupt:
+        util.warning("server stopping (received interrupt)")
+
+    finally:
+        listener.close()
+        os.remove(socket_path)
+
+        for pid in running:
+            os.waitpid(pid, 0)
+
+
+def request(socket_path, message):
+    """Send a request to the server listening on the Unix socket at
+    'socket_path' and return its reply. ServerError is raised if the
+    server cannot be reached or if it could not run the job.
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        conn.connect(socket_path)
+    except OSError:
+        conn.close()
+        raise ServerError("could not connect to a server at '{}' (is "
+                          "'socrates serve' running?)".format(socket_path))
+
+    try:
+        conn.sendall(json.dumps(message).encode('utf-8'))
+        conn.shutdown(socket.SHUT_WR)
+
+        reply = _receive(conn)
+
+    except OSError as e:
+        raise ServerError("lost connection to the server: " + str(e))
+
+    finally:
+        conn.close()
+
+    if 'error' in reply:
+        raise ServerError(reply['error'])
+
+    return reply
+
+
+def _listen(socket_path):
+    """Return a socket listening at 'socket_path'. A socket file left
+    behind by a server that is no longer running is replaced, but
+    ServerError is raised if another server is still listening there.
+    """
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.remove(socket_path)
+        else:
+            raise ServerError("another server is already listening at "
+                              "'{}'".format(socket_path))
+        finally:
+            probe.close()
+
+    util.makedirs(os.path.dirname(os.path.abspath(socket_path)))
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    # jobs run code as the user running the server, so only that user may
+    # connect to it
+    old_umask = os.umask(0o177)
+    try:
+        listener.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+
+    listener.listen()
+    return listener
+
+
+def _run_child(conn, run, message, prepared):
+    """In a forked child, run the job with its output written to a
+    temporary file, reply to the client, and exit. Never returns.
+    """
+    import tempfile
+    import traceback
+
+    try:
+        output = tempfile.TemporaryFile()
+        null_fd = os.open(os.devnull, os.O_RDONLY)
+
+        os.dup2(null_fd, 0)
+        os.dup2(output.fileno(), 1)
+        os.dup2(output.fileno(), 2)
+
+        try:
+            reply = run(message, prepared)
+        except:
+            traceback.print_exc()
+            reply = {'error': "unexpected error while running the job"}
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        output.seek(0)
+        reply['output'] = output.read().decode('utf-8', errors='replace')
+
+        _reply(conn, reply)
+
+    finally:
+        os._exit(0)
+
+
+def _receive(conn):
+    """Read a JSON object from the connection until the other end stops
+    writing, and return it. ServerError is raised if it is not valid.
+    """
+    chunks = []
+    size = 0
+
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+
+        size += len(chunk)
+        if size > MAX_MESSAGE_SIZE:
+            raise ServerError("message is too large")
+
+        chunks.append(chunk)
+
+    try:
+        message = json.loads(b''.join(chunks).decode('utf-8'))
+    except ValueError:
+        raise ServerError("message is not valid JSON")
+
+    if type(message) is not dict:
+        raise ServerError("message is not a JSON object")
+
+    return message
+
+
+def _reply(conn, reply):
+    """Send the reply and close the connection. Values that JSON cannot
+    represent (e.g., in test results) are sent as strings.
+    """
+    try:
+        conn.sendall(json.dumps(reply, default=str).encode('utf-8'))
+    except OSError:
+        # the client went away; there is nobody left to tell
+        pass
+    finally:
+        conn.close()
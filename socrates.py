@@ -10,7 +10,6 @@ import datetime
 
 import cmdline
 import util
-import criteria
 import config
 import hooks
 
@@ -30,7 +29,17 @@ def main(args):
     if args.mode == 'edit':
         _edit(args)
 
-    if args.mode in ['grade', 'submit', 'batch']:
+    if args.mode == 'serve':
+        _serve(args)
+
+    if args.mode in ['grade', 'batch'] and args.client:
+        # the server finds and loads the criteria file
+        if args.mode == 'grade':
+            _grade_client(args)
+        else:
+            _batch_client(args)
+
+    elif args.mode in ['grade', 'submit', 'batch']:
         try:
             sname, group = _parse_assignment_name(args.assignment_with_group)
         except ValueError as err:
@@ -50,12 +59,7 @@ def main(args):
             util.exit(util.ERR_CRITERIA_MISSING)
 
         criteria_object = _create_criteria_object(criteria_path)
-
-        assignment_name, group = criteria_object.name, criteria_object.group
-        grade_filename = assignment_name
-        if group:
-            grade_filename += group
-        grade_filename += '-grade.txt'
+        grade_filename = _grade_filename(criteria_object)
 
         if args.mode == 'grade':
             _grade(args, criteria_object, grade_filename)
@@ -64,7 +68,7 @@ def main(args):
             _submit(args, criteria_object, grade_filename)
 
         elif args.mode == 'batch':
-            _batch(args)
+            _batch(args, criteria_object, grade_filename)
 
 
 def _config():
@@ -162,12 +166,12 @@ def _edit(args):
             break
 
 
-def _grade(args, criteria_object, grade_filename):
+def _grade(args, criteria_object, grade_filename, report=None):
     """Handles 'grade' mode. Most of the work is handed off
-    to the 'grader' module, which runs interactively.
+    to the 'grader' module, which runs interactively. If 'report' is a
+    dict, grader.grade() fills it in with the grade as data.
     """
     import grader
-    from prompt import prompt
 
     if not args.overwrite and os.path.isfile(grade_filename):
         util.error("refusing to overwrite existing grade file")
@@ -183,20 +187,12 @@ def _grade(args, criteria_object, grade_filename):
     any_missing = grader.grade(criteria_object, args.submission_files,
                                grade_filename,
                                assume_missing=args.assume_missing,
-                               late_check=False if args.no_late else True)
+                               late_check=False if args.no_late else True,
+                               cache_results=args.cache_results,
+                               report=report)
 
     if not args.no_edit:
-        util.info("please review the following grade file ({}) "
-                  "for issues".format(grade_filename))
-
-        with open(grade_filename) as f:
-            util.print(f.read())
-
-        choices = ["edit the grade file now", "do not edit the grade file"]
-        selections = prompt(choices, mode='1')
-
-        if 0 in selections:
-            _edit_file(grade_filename)
+        _review_grade_file(grade_filename)
 
     hooks.run_hooks_for('before_exit')
 
@@ -208,6 +204,74 @@ def _grade(args, criteria_object, grade_filename):
         util.exit(util.EXIT_WITH_MISSING)
 
 
+def _review_grade_file(grade_filename):
+    """Print the grade file and offer to open it in an editor."""
+    from prompt import prompt
+
+    util.info("please review the following grade file ({}) "
+              "for issues".format(grade_filename))
+
+    with open(grade_filename) as f:
+        util.print(f.read())
+
+    choices = ["edit the grade file now", "do not edit the grade file"]
+    selections = prompt(choices, mode='1')
+
+    if 0 in selections:
+        _edit_file(grade_filename)
+
+
+def _grade_client(args):
+    """Handles 'grade --client' mode. The submission files are graded by
+    a running 'socrates serve', which already has the criteria loaded.
+    The server cannot prompt, so misnamed files are assumed to be missing,
+    but the grade file can still be reviewed and edited here.
+    """
+    import server
+
+    message = _client_message(args, os.curdir, args.submission_files,
+                              overwrite=args.overwrite)
+
+    try:
+        reply = server.request(_socket_path(args), message)
+    except server.ServerError as e:
+        util.error(str(e))
+        util.exit(util.ERR_SERVER, hooks=False, traceback=False)
+
+    sys.stdout.write(reply['output'])
+    sys.stdout.flush()
+
+    return_val = reply['code']
+
+    if return_val in [0, util.EXIT_WITH_MISSING] and not args.no_edit:
+        _review_grade_file(reply['grade_file'])
+
+    if return_val != 0:
+        util.exit(return_val, hooks=False)
+
+
+def _client_message(args, directory, files, overwrite=False):
+    """Return the request that asks the server to grade the files in the
+    directory for the assignment given on the command line.
+    """
+    return {'assignment': args.assignment_with_group,
+            'directory': os.path.abspath(directory),
+            'files': files,
+            'no_late': args.no_late,
+            'cache_results': args.cache_results,
+            'overwrite': overwrite}
+
+
+def _socket_path(args):
+    """Return the path to the server's socket: the one given on the
+    command line, or the one from the configuration file.
+    """
+    if args.socket is not None:
+        return args.socket
+
+    return config.server_socket
+
+
 def _submit(args, criteria_object, grade_filename, umask=0o002):
     """Handles 'submit' mode. Allows a grader to send completed grade files
     to the "dropbox" directory.
@@ -260,58 +324,737 @@ def _submit(args, criteria_object, grade_filename, umask=0o002):
                                        util.plural('grade', num_submitted)))
 
 
-def _batch(args):
-    """Handles 'batch' mode."""
+def _batch(args, criteria_object, grade_filename):
+    """Handles 'batch' mode. Each submission directory is graded by a
+    separate 'socrates grade' process whose working directory is the
+    submission directory, or, if grading in-process, by a forked copy of
+    this process that reuses the criteria object already loaded here.
+    If more than one job was requested, up to that many processes run at
+    once and the output of each is saved to a log file in the log directory.
+    Every graded directory is recorded in the journal, so that a batch
+    that stops early can be resumed without grading them again.
+    """
     import inspect
-    import subprocess
 
     # absolute path of the current running Python script
     proc = os.path.abspath(inspect.getfile(inspect.currentframe()))
 
+    subdirs = _submission_dirs(args)
+    batch_journal, subdirs = _open_journal(args, subdirs)
+
+    if args.dedup:
+        # duplicates are graded using the results cached for the originals
+        args.cache_results = True
+        phases = _dedup_phases(subdirs,
+                               [f.path for f in criteria_object.files])
+    else:
+        phases = [subdirs]
+
+    log_paths = _batch_log_paths(args.log_dir, subdirs)
+
+    if args.in_process:
+        codes = _batch_phases(phases, args.jobs, lambda phase: _batch_forked(
+                              args, criteria_object, grade_filename, phase,
+                              batch_journal, log_paths))
+
+        failed_code = _batch_summary(codes)
+        if failed_code is not None:
+            util.exit(failed_code)
+
+        return
+
+    sub_args = [proc, 'grade']
+
+    # a child process graded in parallel has no terminal to prompt on
+    if args.no_edit or args.jobs > 1:
+        sub_args.append("--no-edit")
+
+    if args.assume_missing or args.jobs > 1:
+        sub_args.append("--assume-missing")
+
+    if args.no_late:
+        sub_args.append("--no-late")
+
+    if args.cache_results:
+        sub_args.append("--cache-results")
+
+    sub_args.append(args.assignment_with_group)
+
+    if args.jobs == 1:
+        codes = _batch_phases(phases, args.jobs, lambda phase: _batch_serial(
+                              sub_args, phase, batch_journal, grade_filename))
+    else:
+        util.makedirs(args.log_dir)
+        codes = _batch_phases(phases, args.jobs, lambda phase:
+                              _batch_parallel(sub_args, phase, args.jobs,
+                                              log_paths, batch_journal,
+                                              grade_filename))
+
+    failed_code = _batch_summary(codes)
+    if failed_code is not None:
+        util.exit(failed_code)
+
+
+def _dedup_phases(subdirs, file_names):
+    """Split the submission directories for 'batch --dedup' into two
+    lists: first, directories that each have at least one file not found
+    in an earlier directory, and then the rest. 'file_names' lists the
+    files to compare (e.g., the files named by the criteria), or is None to
+    compare every file. By the time the second list is graded, the tests
+    of each of its files have run on a file with the same contents, and
+    their cached results are used instead of running them again.
+    """
+    import cache
+
+    seen = set()                # (file name, hash of contents) pairs
+    num_files = 0
+    first, rest = [], []
+
+    for subdir in subdirs:
+        if file_names is None:
+            names = sorted(os.listdir(subdir))
+        else:
+            names = file_names
+
+        has_new_file = False
+        for name in names:
+            path = os.path.join(subdir, name)
+            if not os.path.isfile(path):
+                continue
+
+            num_files += 1
+
+            pair = (name, cache.file_hash(path))
+            if pair not in seen:
+                seen.add(pair)
+                has_new_file = True
+
+        if has_new_file:
+            first.append(subdir)
+        else:
+            rest.append(subdir)
+
+    util.info("found {} distinct {} among {} submitted; the {} {} with "
+              "only duplicates will be graded last".format(
+              len(seen), util.plural('file', len(seen)), num_files,
+              len(rest), util.plural('submission', len(rest))))
+
+    return [first, rest]
+
+
+def _batch_phases(phases, jobs, grade):
+    """Given lists of submission directories and a function that grades
+    a list of them and returns a dict of their exit codes (e.g., a call to
+    _batch_serial()), grade each list after the one before it has been
+    graded completely, and return a dict of all the exit codes. As when
+    grading one submission at a time, a submission that ends in an error
+    stops the batch if 'jobs' is 1.
+    """
+    codes = {}
+
+    for phase in phases:
+        phase_codes = grade(phase)
+        codes.update(phase_codes)
+
+        failed = any(c != 0 and c not in OKAY_CONDITIONS
+                     for c in phase_codes.values())
+
+        if failed and jobs == 1:
+            break
+
+    return codes
+
+
+def _submission_dirs(args):
+    """Return the submission directories given on the command line,
+    leaving out (with an error) any that are not directories.
+    """
     if not args.submission_dirs:
         util.warning("no submissions specified")
 
+    subdirs = []
     for subdir in args.submission_dirs:
         if not os.path.isdir(subdir):
             util.error("invalid submission directory '{}'".format(subdir))
             continue
 
-        os.chdir(subdir)
+        subdirs.append(subdir)
 
-        # this will simulate a user executing socrates grade * at a shell
-        files_here = os.listdir(os.curdir)
+    return subdirs
 
-        util.info("running socrates in '{}'".format(subdir))
 
-        sub_args = [proc, 'grade']
+def _open_journal(args, subdirs):
+    """Return the batch's journal and the submission directories that
+    still need to be graded: all of them, unless the batch is resuming, in
+    which case those that the journal shows were already graded (and whose
+    grade files still exist) are left out.
+    """
+    import journal
+
+    batch_journal = journal.Journal(args.journal, args.assignment_with_group)
+
+    if not args.resume:
+        return batch_journal, subdirs
+
+    finished = batch_journal.finished()
+    remaining = [d for d in subdirs if os.path.abspath(d) not in finished]
+
+    num_skipped = len(subdirs) - len(remaining)
+    util.info("resuming: skipping {} {} already graded (see '{}')".format(
+              num_skipped, util.plural('submission', num_skipped),
+              args.journal))
 
-        if args.no_edit:
-            sub_args.append("--no-edit")
+    return batch_journal, remaining
 
-        if args.assume_missing:
-            sub_args.append("--assume-missing")
 
-        if args.no_late:
-            sub_args.append("--no-late")
+def _batch_serial(sub_args, subdirs, batch_journal, grade_filename):
+    """Grade each of the submission directories one at a time, letting the
+    child processes use this terminal. Grading stops after the first child
+    that exits with an error. Each graded directory is recorded in the
+    journal. A dict mapping each graded directory to the exit code of its
+    child is returned.
+    """
+    import subprocess
+    import time
+
+    codes = {}
+    for subdir in subdirs:
+        # this will simulate a user executing socrates grade * at a shell
+        files_here = os.listdir(subdir)
 
-        sub_args.append(args.assignment_with_group)
+        util.info("running socrates in '{}'".format(subdir))
 
         try:
-            return_val = subprocess.call(sub_args + files_here)
+            start = time.time()
+            return_val = subprocess.call(sub_args + files_here, cwd=subdir)
 
         except KeyboardInterrupt:
             util.warning("parent stopping (received interrupt)")
             util.warning("stopped while grading '{}'".format(subdir))
-            os.chdir(os.pardir)
             util.exit(util.ERR_INTERRUPTED)
 
+        codes[subdir] = return_val
+        batch_journal.record(subdir, return_val, time.time() - start,
+                             os.path.join(subdir, grade_filename))
+
         if return_val != 0 and return_val not in OKAY_CONDITIONS:
             util.error("child process encountered an error")
-            os.chdir(os.pardir)
-            util.exit(return_val)
+            break
 
         util.info("completed subdirectory '{}'".format(subdir))
-        os.chdir(os.pardir)
+
+    return codes
+
+
+def _batch_parallel(sub_args, subdirs, jobs, log_paths, batch_journal,
+                    grade_filename):
+    """Grade the submission directories using a pool of at most 'jobs'
+    child processes running at once. The standard output and standard
+    error of each child are saved to the log file given for its directory
+    in 'log_paths' (see _batch_log_paths()).
+    Each graded directory is recorded in the journal as soon as its child
+    exits. A dict mapping each graded directory to the exit code of its
+    child is returned.
+    """
+    import subprocess
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    stopping = threading.Event()
+
+    def grade(subdir):
+        if stopping.is_set():
+            return None
+
+        files_here = os.listdir(subdir)
+        log_path = log_paths[subdir]
+
+        start = time.time()
+
+        with open(log_path, 'w') as log:
+            return_val = subprocess.call(sub_args + files_here, cwd=subdir,
+                                         stdin=subprocess.DEVNULL,
+                                         stdout=log, stderr=subprocess.STDOUT)
+
+        batch_journal.record(subdir, return_val, time.time() - start,
+                             os.path.join(subdir, grade_filename))
+
+        if return_val != 0 and return_val not in OKAY_CONDITIONS:
+            util.error("error grading '{}' (exit code {}, see "
+                       "'{}')".format(subdir, return_val, log_path))
+        else:
+            util.info("completed subdirectory '{}'".format(subdir))
+
+        return return_val
+
+    util.info("grading {} {}, {} at a time".format(len(subdirs),
+              util.plural('submission', len(subdirs)), jobs))
+
+    codes = {}
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    futures = [(subdir, executor.submit(grade, subdir)) for subdir in subdirs]
+
+    try:
+        for subdir, future in futures:
+            return_val = future.result()
+            if return_val is not None:
+                codes[subdir] = return_val
+
+    except KeyboardInterrupt:
+        stopping.set()
+        util.warning("parent stopping (received interrupt)")
+        executor.shutdown(wait=True)
+        _batch_summary(codes)
+        util.exit(util.ERR_INTERRUPTED)
+
+    executor.shutdown(wait=True)
+
+    return codes
+
+
+def _batch_forked(args, criteria_object, grade_filename, subdirs,
+                  batch_journal, log_paths):
+    """Grade the submission directories in forked children of this
+    process, so that the criteria file is parsed and its objects are built
+    only once for the whole batch. Each child starts from a copy of this
+    process, so state left behind by one student (e.g., imported modules)
+    never reaches another. Up to 'args.jobs' children run at once; as in
+    _batch_parallel(), their output goes to log files when there is more
+    than one, named by 'log_paths'. Each graded directory is recorded in
+    the journal as soon as its child exits. A dict mapping each graded
+    directory to the exit code of its child is returned.
+    """
+    import time
+
+    parallel = args.jobs > 1
+
+    if parallel:
+        util.makedirs(args.log_dir)
+
+        util.info("grading {} {} in-process, {} at a time".format(
+                  len(subdirs), util.plural('submission', len(subdirs)),
+                  args.jobs))
+
+    codes = {}
+    running = {}                # maps child PIDs to submission directories
+    started = {}                # maps submission directories to start times
+    queue = list(subdirs)
+    stop = False
+
+    try:
+        while running or (queue and not stop):
+            while queue and not stop and len(running) < args.jobs:
+                subdir = queue.pop(0)
+
+                if parallel:
+                    log_path = log_paths[subdir]
+                else:
+                    log_path = None
+                    util.info("grading '{}' in-process".format(subdir))
+
+                started[subdir] = time.time()
+                pid = _fork_grade(args, criteria_object, grade_filename,
+                                  subdir, log_path)
+                running[pid] = subdir
+
+            pid, status = os.waitpid(-1, 0)
+            subdir = running.pop(pid)
+            return_val = _exit_code_from_status(status)
+            codes[subdir] = return_val
+
+            batch_journal.record(subdir, return_val,
+                                 time.time() - started[subdir],
+                                 os.path.join(subdir, grade_filename))
+
+            if return_val != 0 and return_val not in OKAY_CONDITIONS:
+                if parallel:
+                    util.error("error grading '{}' (exit code {}, see "
+                               "'{}')".format(subdir, return_val,
+                               log_paths[subdir]))
+                else:
+                    util.error("child process encountered an error")
+                    stop = True
+            else:
+                util.info("completed subdirectory '{}'".format(subdir))
+
+    except KeyboardInterrupt:
+        util.warning("parent stopping (received interrupt)")
+
+        # the children received the interrupt, too
+        for pid, subdir in running.items():
+            _, status = os.waitpid(pid, 0)
+            codes[subdir] = _exit_code_from_status(status)
+
+        _batch_summary(codes)
+        util.exit(util.ERR_INTERRUPTED)
+
+    # children finish in any order; report them in the order given
+    return {d: codes[d] for d in subdirs if d in codes}
+
+
+def _fork_grade(args, criteria_object, grade_filename, subdir, log_path):
+    """Fork a child process that changes into the submission directory and
+    grades every file in it using the given criteria object, as
+    'socrates grade' would. If 'log_path' is not None, the child's output
+    is written to that file and its standard input is closed. The PID of
+    the child is returned to the parent; the child never returns.
+    """
+    import argparse
+
+    if log_path is not None:
+        log_path = os.path.abspath(log_path)
+
+    # anything still buffered would otherwise be printed by the child, too
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    pid = os.fork()
+    if pid != 0:
+        return pid
+
+    return_val = 0
+    try:
+        if log_path is not None:
+            log_fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                             0o666)
+            null_fd = os.open(os.devnull, os.O_RDONLY)
+
+            os.dup2(null_fd, 0)
+            os.dup2(log_fd, 1)
+            os.dup2(log_fd, 2)
+
+        os.chdir(subdir)
+
+        grade_args = argparse.Namespace(
+            submission_files=os.listdir(os.curdir),
+            assume_missing=args.assume_missing or log_path is not None,
+            no_edit=args.no_edit or log_path is not None,
+            no_late=args.no_late,
+            cache_results=args.cache_results,
+            overwrite=False)
+
+        return_val = _grade_exit_code(grade_args, criteria_object,
+                                      grade_filename)
+
+    except:
+        util.print_traceback()
+        return_val = util.ERR_GRADING_MISC
+
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(return_val)
+
+
+def _grade_exit_code(args, criteria_object, grade_filename, report=None):
+    """Run _grade() in a process that must not exit when grading ends
+    (e.g., a forked child that has more to do), and return the exit code
+    that 'socrates grade' would have exited with.
+    """
+    try:
+        _grade(args, criteria_object, grade_filename, report)
+
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        elif type(e.code) is int:
+            return e.code
+        else:
+            return 1
+
+    except:
+        util.print_traceback()
+        return util.ERR_GRADING_MISC
+
+    return 0
+
+
+def _batch_client(args):
+    """Handles 'batch --client' mode. Each submission directory is sent
+    to a running 'socrates serve' as a separate job, with up to 'args.jobs'
+    jobs sent at once (the server's own --jobs option limits how many it
+    runs at once). As in _batch_parallel(), the output of each submission
+    goes to a log file when there is more than one job at a time, and each
+    graded directory is recorded in the journal.
+    """
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    import server
+
+    subdirs = _submission_dirs(args)
+    batch_journal, subdirs = _open_journal(args, subdirs)
+    socket_path = _socket_path(args)
+    log_paths = _batch_log_paths(args.log_dir, subdirs)
+    parallel = args.jobs > 1
+
+    if parallel:
+        util.makedirs(args.log_dir)
+
+    stopping = threading.Event()
+
+    def grade(subdir):
+        if stopping.is_set():
+            return None
+
+        if not parallel:
+            util.info("grading '{}' using the server".format(subdir))
+
+        message = _client_message(args, subdir, os.listdir(subdir))
+        start = time.time()
+
+        try:
+            reply = server.request(socket_path, message)
+
+        except server.ServerError as e:
+            # the next submission would almost certainly fail the same way
+            util.error("error grading '{}': {}".format(subdir, e))
+            stopping.set()
+            return util.ERR_SERVER
+
+        return_val = reply['code']
+        batch_journal.record(subdir, return_val, time.time() - start,
+                             reply['grade_file'])
+
+        if parallel:
+            log_path = log_paths[subdir]
+            with open(log_path, 'w') as log:
+                log.write(reply['output'])
+        else:
+            sys.stdout.write(reply['output'])
+            sys.stdout.flush()
+
+        if return_val != 0 and return_val not in OKAY_CONDITIONS:
+            if parallel:
+                util.error("error grading '{}' (exit code {}, see "
+                           "'{}')".format(subdir, return_val, log_path))
+            else:
+                util.error("server encountered an error")
+                stopping.set()
+        else:
+            util.info("completed subdirectory '{}'".format(subdir))
+
+        return return_val
+
+    if args.dedup:
+        # the server grades duplicates using the results cached for the
+        # originals; without the criteria, every file is compared
+        args.cache_results = True
+        phases = _dedup_phases(subdirs, None)
+    else:
+        phases = [subdirs]
+
+    codes = {}
+    executor = ThreadPoolExecutor(max_workers=args.jobs)
+
+    try:
+        for phase in phases:
+            if parallel:
+                util.info("grading {} {} using the server, {} at a "
+                          "time".format(len(phase),
+                          util.plural('submission', len(phase)), args.jobs))
+
+            futures = [(subdir, executor.submit(grade, subdir))
+                       for subdir in phase]
+
+            for subdir, future in futures:
+                return_val = future.result()
+                if return_val is not None:
+                    codes[subdir] = return_val
+
+    except KeyboardInterrupt:
+        stopping.set()
+        util.warning("parent stopping (received interrupt)")
+        executor.shutdown(wait=True)
+        _batch_summary(codes)
+        util.exit(util.ERR_INTERRUPTED)
+
+    executor.shutdown(wait=True)
+
+    failed_code = _batch_summary(codes)
+    if failed_code is not None:
+        util.exit(failed_code)
+
+
+def _exit_code_from_status(status):
+    """Given a status returned by os.waitpid(), return the child's exit
+    code, using the shell's convention of 128 plus the signal number for
+    a child that was killed by a signal.
+    """
+    if os.WIFSIGNALED(status):
+        return 128 + os.WTERMSIG(status)
+
+    return os.WEXITSTATUS(status)
+
+
+def _batch_log_paths(log_dir, subdirs):
+    """Given the log directory and the submission directories of a batch,
+    return a dict mapping each submission directory to the path of the
+    file that should receive the output of grading it. A file is named
+    after the directory's path relative to the directory containing all of
+    them, so 'sec1/alice' and 'sec2/alice' are logged to 'sec1_alice.log'
+    and 'sec2_alice.log'; a number is added to a name that is still taken.
+    """
+    abs_dirs = [os.path.abspath(subdir) for subdir in subdirs]
+    if abs_dirs:
+        root = os.path.commonpath(abs_dirs)
+
+    paths = {}
+    taken = set()
+
+    for subdir, abs_dir in zip(subdirs, abs_dirs):
+        name = os.path.relpath(abs_dir, root)
+        if name == os.curdir:
+            name = os.path.basename(abs_dir)
+
+        name = name.replace(os.sep, '_')
+
+        unique_name = name
+        suffix = 2
+        while unique_name in taken:
+            unique_name = "{}-{}".format(name, suffix)
+            suffix += 1
+
+        taken.add(unique_name)
+        paths[subdir] = os.path.join(log_dir, unique_name + '.log')
+
+    return paths
+
+
+def _batch_summary(codes):
+    """Given a dict mapping submission directories to the exit codes of
+    the child processes that graded them, print a summary of the batch.
+    If any child exited with an error, the first such exit code is
+    returned. Otherwise, None is returned.
+    """
+    failed = [(d, c) for d, c in codes.items()
+              if c != 0 and c not in OKAY_CONDITIONS]
+
+    num_missing = list(codes.values()).count(util.EXIT_WITH_MISSING)
+    num_deferred = list(codes.values()).count(util.EXIT_WITH_DEFER)
+    num_existing = list(codes.values()).count(util.ERR_GRADE_FILE_EXISTS)
+
+    util.info("graded {} {}".format(len(codes),
+                                    util.plural('submission', len(codes))))
+
+    if num_missing:
+        util.info("{} with missing files".format(num_missing))
+
+    if num_deferred:
+        util.info("{} deferred".format(num_deferred))
+
+    if num_existing:
+        util.info("{} already had a grade file".format(num_existing))
+
+    if failed:
+        util.error("{} {} with errors:".format(len(failed),
+                   util.plural('submission', len(failed))))
+
+        for subdir, code in failed:
+            util.error("    '{}' (exit code {})".format(subdir, code))
+
+        return failed[0][1]
+
+    return None
+
+
+def _serve(args):
+    """Handles 'serve' mode. Grading jobs sent by 'socrates grade --client'
+    and 'socrates batch --client' are run as they arrive, each in a forked
+    copy of this process (see the 'server' module). The Criteria object for
+    each assignment is kept between jobs, and is only loaded again when its
+    criteria file changes.
+    """
+    import argparse
+
+    import criteria
+    import server
+
+    # maps criteria file paths to ((modification time, size), Criteria)
+    loaded = {}
+
+    def prepare(message):
+        assignment = message.get('assignment')
+        directory = message.get('directory')
+        files = message.get('files')
+
+        try:
+            short_name, group = _parse_assignment_name(assignment)
+        except (TypeError, ValueError):
+            raise server.ServerError("invalid assignment name "
+                                     "{!r}".format(assignment))
+
+        if type(directory) is not str or not os.path.isabs(directory) or \
+           not os.path.isdir(directory):
+            raise server.ServerError("invalid submission directory "
+                                     "{!r}".format(directory))
+
+        if type(files) is not list or \
+           not all(type(f) is str for f in files):
+            raise server.ServerError("invalid list of submission files")
+
+        criteria_path = _form_criteria_path(short_name, group)
+
+        try:
+            stat = os.stat(criteria_path)
+        except OSError:
+            raise server.ServerError("could not find criteria file for "
+                                     "{}".format(assignment))
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        if criteria_path not in loaded or \
+           loaded[criteria_path][0] != signature:
+            try:
+                criteria_object = criteria.Criteria.from_yaml(criteria_path)
+
+            except (Exception, SystemExit) as e:
+                util.error("error loading criteria file "
+                           "'{}'".format(criteria_path))
+                util.print_traceback()
+
+                raise server.ServerError("error loading criteria file "
+                                         "for {}: {}".format(assignment, e))
+
+            util.info("loaded criteria file '{}'".format(criteria_path))
+            loaded[criteria_path] = (signature, criteria_object)
+
+        util.info("grading '{}' for {}".format(directory, assignment))
+
+        return loaded[criteria_path][1]
+
+    def run(message, criteria_object):
+        os.chdir(message['directory'])
+
+        grade_filename = _grade_filename(criteria_object)
+        grade_args = argparse.Namespace(
+            submission_files=message['files'],
+            assume_missing=True,
+            no_edit=True,
+            no_late=bool(message.get('no_late')),
+            cache_results=bool(message.get('cache_results')),
+            overwrite=bool(message.get('overwrite')))
+
+        report = {}
+        return_val = _grade_exit_code(grade_args, criteria_object,
+                                      grade_filename, report)
+
+        return {'code': return_val,
+                'grade_file': os.path.abspath(grade_filename),
+                'grade': report}
+
+    socket_path = _socket_path(args)
+
+    util.info("listening on '{}', grading {} at a time".format(socket_path,
+                                                                args.jobs))
+
+    try:
+        server.serve(socket_path, prepare, run, args.jobs)
+    except server.ServerError as e:
+        util.error(str(e))
+        util.exit(util.ERR_SERVER, traceback=False)
 
 
 def _parse_assignment_name(short_name_with_group):
@@ -352,6 +1095,8 @@ def _create_criteria_object(criteria_path):
     'criteria' module and its Criteria class. Calling that class'
     constructor is pretty costly.
     """
+    import criteria
+
     try:
         criteria_object = criteria.Criteria.from_yaml(criteria_path)
 
@@ -366,6 +1111,17 @@ def _create_criteria_object(criteria_path):
     return criteria_object
 
 
+def _grade_filename(criteria_object):
+    """Given a Criteria object, return the name of the grade file that
+    grading a submission for its assignment produces (e.g., "ps4a-grade.txt").
+    """
+    grade_filename = criteria_object.name
+    if criteria_object.group:
+        grade_filename += criteria_object.group
+
+    return grade_filename + '-grade.txt'
+
+
 def _get_dropbox_path(args):
     """Given valid arguments from a user, use the configuration file data
     and the assignment specified on the command line to form a path to the
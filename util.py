@@ -5,8 +5,6 @@ import os
 import builtins
 import signal
 
-import blessed
-
 ERR_ARGS = 1
 ERR_INTERRUPTED = 2
 ERR_CRITERIA_MISSING = 3
@@ -21,6 +19,7 @@ ERR_BAD_ASSIGNMENT = 11
 ERR_NO_EDITOR = 12
 ERR_ABNORMAL_HOOK_EXIT = 14
 ERR_SCRIPT_RUNTIME_ERROR = 15
+ERR_SERVER = 16
 
 EXIT_WITH_MISSING = 100
 EXIT_WITH_DEFER = 101
@@ -30,18 +29,31 @@ ALPHABET = [chr(ord('a') + i) for i in range(26)] + \
 
 ALPHANUMERICS = ALPHABET + [str(i) for i in range(10)]
 
-terminal = blessed.Terminal()
+# the blessed.Terminal used for colored output, which is only set up (and
+# blessed only imported) when something is first printed in color
+_terminal = None
 _ui = False
 
 _prog_name = os.path.basename(sys.argv[0])
 
 
+def terminal():
+    """Return the blessed.Terminal object used for colored output."""
+    global _terminal
+
+    if _terminal is None:
+        import blessed
+        _terminal = blessed.Terminal()
+
+    return _terminal
+
+
 def green(string):
-    return terminal.green(string)
+    return terminal().green(string)
 
 
 def yellow(string):
-    return terminal.yellow(string)
+    return terminal().yellow(string)
 
 
 def print(string, end='\n'):
@@ -49,15 +61,15 @@ def print(string, end='\n'):
 
 
 def info(string):
-    print(_prog_name + ': ' + terminal.blue(string))
+    print(_prog_name + ': ' + terminal().blue(string))
 
 
 def warning(string):
-    print(_prog_name + ': ' + terminal.yellow(string))
+    print(_prog_name + ': ' + terminal().yellow(string))
 
 
 def error(string):
-    print(_prog_name + ': ' + terminal.red(string))
+    print(_prog_name + ': ' + terminal().red(string))
 
 
 def print_traceback():